@@ -10,7 +10,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app.core.database import Base
-from app.models import User, OTPVerification, ChatSession, ChatTranscript
+from app.models import User, OTPVerification, RefreshToken, ChatSession, ChatTranscript, Job
 from app.core.config import settings
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,29 @@
+"""index refresh_tokens expires_at and revoked_at for the sweeper
+
+Revision ID: a4d8c2e6f913
+Revises: c3e9f1a7b2d4
+Create Date: 2026-10-18 14:37:05.926411
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8c2e6f913'
+down_revision: Union[str, Sequence[str], None] = 'c3e9f1a7b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_wannabeaiops_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False, schema='wannabeaiops')
+    op.create_index(op.f('ix_wannabeaiops_refresh_tokens_revoked_at'), 'refresh_tokens', ['revoked_at'], unique=False, schema='wannabeaiops')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_wannabeaiops_refresh_tokens_revoked_at'), table_name='refresh_tokens', schema='wannabeaiops')
+    op.drop_index(op.f('ix_wannabeaiops_refresh_tokens_expires_at'), table_name='refresh_tokens', schema='wannabeaiops')
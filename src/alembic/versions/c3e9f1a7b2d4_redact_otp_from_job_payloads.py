@@ -0,0 +1,33 @@
+"""redact otp codes from queued send_email job payloads
+
+Revision ID: c3e9f1a7b2d4
+Revises: e5a83c1f0d27
+Create Date: 2026-10-18 10:12:31.480215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e9f1a7b2d4'
+down_revision: Union[str, Sequence[str], None] = 'e5a83c1f0d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # send_email jobs used to carry the plaintext OTP; the worker now loads it from otp_verification
+    op.execute("""
+        UPDATE wannabeaiops.jobs
+        SET payload = jsonb_set(payload #- '{kwargs,otp}', '{load_otp}', 'true'::jsonb)
+        WHERE kind = 'send_email' AND payload #> '{kwargs,otp}' IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The removed codes cannot be restored
+    pass
@@ -0,0 +1,51 @@
+"""otp expires_at as timestamptz, unique email and expiry index
+
+Revision ID: e5a83c1f0d27
+Revises: b7d4e2a91c55
+Create Date: 2026-10-17 18:02:47.311894
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a83c1f0d27'
+down_revision: Union[str, Sequence[str], None] = 'b7d4e2a91c55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep only the newest OTP per email so the unique index (the upsert's conflict target) can be built
+    op.execute("""
+        DELETE FROM wannabeaiops.otp_verification o
+        USING wannabeaiops.otp_verification newer
+        WHERE o.email = newer.email
+          AND (coalesce(o.created_at, '-infinity'), o.id) < (coalesce(newer.created_at, '-infinity'), newer.id)
+    """)
+    op.alter_column('otp_verification', 'expires_at',
+                    existing_type=sa.String(),
+                    type_=sa.DateTime(timezone=True),
+                    existing_nullable=False,
+                    postgresql_using='expires_at::timestamptz',
+                    schema='wannabeaiops')
+    op.drop_index(op.f('ix_wannabeaiops_otp_verification_email'), table_name='otp_verification', schema='wannabeaiops')
+    op.create_index(op.f('ix_wannabeaiops_otp_verification_email'), 'otp_verification', ['email'], unique=True, schema='wannabeaiops')
+    op.create_index(op.f('ix_wannabeaiops_otp_verification_expires_at'), 'otp_verification', ['expires_at'], unique=False, schema='wannabeaiops')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_wannabeaiops_otp_verification_expires_at'), table_name='otp_verification', schema='wannabeaiops')
+    op.drop_index(op.f('ix_wannabeaiops_otp_verification_email'), table_name='otp_verification', schema='wannabeaiops')
+    op.create_index(op.f('ix_wannabeaiops_otp_verification_email'), 'otp_verification', ['email'], unique=False, schema='wannabeaiops')
+    op.alter_column('otp_verification', 'expires_at',
+                    existing_type=sa.DateTime(timezone=True),
+                    type_=sa.String(),
+                    existing_nullable=False,
+                    postgresql_using='expires_at::text',
+                    schema='wannabeaiops')
@@ -2,7 +2,7 @@ from app.services.auth_services import *
 from app.schemas.auth import ResendOTPRequest
 from app.utils.auth_utils import decode_token
 from app.utils.auth_utils import create_and_store_otp
-from app.services.email_services import SendEmail
+from app.services.email_services import dispatch_email
 from fastapi import APIRouter, Depends
 
 from app.core.app_logger import setup_daily_logger
@@ -38,7 +38,7 @@ async def resend_otp_endpoint(data: ResendOTPRequest, session: Session = Depends
     if isinstance(response, APIResponse):
         return response
     
-    _ = SendEmail(_to=email).resend_otp_email(name=email.split("@")[0], otp=response)
+    _ = await dispatch_email(email, "resend_otp_email", name=email.split("@")[0], otp=response)
     return APIResponse(status=status.HTTP_200_OK, message="OTP resent successfully", data=None)
 
 @auth_app.post("/forgot_password")
@@ -49,6 +49,14 @@ async def forgot_password_endpoint(data: ForgotPasswordRequest, session: Session
 async def reset_password_endpoint(data: ResetPasswordRequest, session: Session = Depends(get_session)):
     return await reset_password(data, session)
 
+@auth_app.post("/refresh")
+async def refresh_token_endpoint(data: RefreshTokenRequest, session: Session = Depends(get_session)):
+    return await refresh_access_token(data, session)
+
+@auth_app.post("/logout")
+async def logout_endpoint(data: RefreshTokenRequest, session: Session = Depends(get_session)):
+    return await logout(data, session)
+
 
 @auth_app.delete("/delete_account")
 async def delete_account_endpoint(current_user: str = Depends(get_current_user),
@@ -56,7 +64,7 @@ async def delete_account_endpoint(current_user: str = Depends(get_current_user),
     if isinstance(current_user, APIResponse):
         return current_user
     
-    user = session.query(User).filter(User.id == current_user.id).first()
+    user = await session.get(User, current_user.id)
     if not user:
         logger.warning(f"User not found for account deletion: ID {current_user.id}")
         return APIResponse(status=status.HTTP_404_NOT_FOUND, 
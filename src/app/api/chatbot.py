@@ -1,20 +1,88 @@
 from fastapi import APIRouter, Depends, status, BackgroundTasks, Request
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse, JSONResponse
+from langchain_core.messages import AIMessageChunk
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession as Session
 from app.schemas.common import APIResponse, ChatResponse
-from app.services.chatbot_services import build_chat_graph
-from app.schemas.chat import AgentState, ChatRequest, ChatSessionRequest
+from app.services.chatbot_services import build_chat_graph, needs_compression, compress_thread_state
+from app.core.config import settings
+from app.core.llm_scheduler import llm_scheduler, AdmissionRejected
+from app.services.greeting_services import greeting_pool, seed_greeting
+from app.schemas.chat import AgentState, ChatRequest, ChatSessionRequest, BatchChatRequest
 from app.services.auth_services import get_current_user
 from app.core.database import get_session
 from typing import Optional
 from app.utils.chat_background_utils import *
 from app.services.chat_session_services import *
 import uuid
+import json
+import asyncio
+from datetime import datetime, timezone, timedelta
 
 from app.core.app_logger import setup_daily_logger
 logger = setup_daily_logger(logger_name=__name__)
 
 chatbot_app = APIRouter(prefix="/chatbot")
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _too_many_requests(error: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        headers={"Retry-After": str(error.retry_after)},
+                        content=APIResponse(status=status.HTTP_429_TOO_MANY_REQUESTS,
+                                            message="Chat is busy, please retry later",
+                                            data={"retry_after": error.retry_after}).model_dump())
+
+
+async def _prepare_chat_turn(session: Session, current_user, chat_request: Optional[ChatRequest]):
+    """
+    Build the graph input for a chat turn and create the session row for a new thread.
+    Returns (input_state, thread_id, session_id, user_transcript) or an APIResponse on failure. The user
+    transcript is buffered by the caller once the model has answered, so a turn rejected by admission
+    control leaves no orphan user message behind.
+    """
+    user_transcript = None
+    if chat_request is None:
+        thread_id = str(uuid.uuid4())
+        
+        input_state = AgentState(
+            messages=[],
+            user_input= None,
+            turns_to_compress=0,
+            summary=None,
+        )
+        
+        chat_session = ChatSession(id=str(uuid.uuid4()),
+                                   user_id=current_user.id,
+                                   thread_id=str(thread_id),
+                                   created_at=datetime.now(timezone.utc))
+        # Written now rather than buffered, so a follow-up turn served by any worker finds the thread
+        session.add(chat_session)
+        await session.commit()
+        
+        # Store the session_id for later use
+        session_id = chat_session.id
+    
+    else:
+        input_state = {"user_input": chat_request.user_input}
+        thread_id = chat_request.thread_id
+        
+        # Get the session_id from the database using thread_id
+        chat_session = await session.scalar(select(ChatSession).where(ChatSession.thread_id == str(thread_id),
+                                                                      ChatSession.user_id == current_user.id))
+        if not chat_session:
+            return APIResponse(status=status.HTTP_404_NOT_FOUND, 
+                             message="Chat session not found", data=None)
+        session_id = chat_session.id
+
+        user_transcript = {"id": str(uuid.uuid4()), "thread_id": session_id, "message": chat_request.user_input,
+                           "sender": "User", "created_at": datetime.now(timezone.utc)}
+    
+    return input_state, thread_id, session_id, user_transcript
+
+
 @chatbot_app.post("/chat")
 async def chat_endpoint(request: Request, background_tasks: BackgroundTasks, chat_request: Optional[ChatRequest] = None, current_user: str = Depends(get_current_user),
                         session: Session = Depends(get_session)):
@@ -23,55 +91,221 @@ async def chat_endpoint(request: Request, background_tasks: BackgroundTasks, cha
         if isinstance(current_user, APIResponse):
             return current_user
         
-        if chat_request is None:
-            thread_id = uuid.uuid4()
-            
-            input_state = AgentState(
-                messages=[],
-                user_input= None,
-                turns_to_compress=0,
-            )
-            
-            session_content = {
-                "id": str(uuid.uuid4()),
-                "user_id": current_user.id,
-                "thread_id": str(thread_id),
-                "created_at": datetime.now(timezone.utc)}
-            
-            # Store the session_id for later use
-            session_id = session_content["id"]
-            background_tasks.add_task(session_writer, session, session_content)
+        # Shed load before touching the DB when the model queue is already full
+        # (new sessions served from the greeting pool never reach the model)
+        if chat_request is not None or not greeting_pool:
+            llm_scheduler.check_capacity(current_user.id)
         
-        else:
-            input_state = {"user_input": chat_request.user_input}
-            thread_id = chat_request.thread_id
-            
-            # Get the session_id from the database using thread_id
-            chat_session = session.query(ChatSession).filter(ChatSession.thread_id == str(thread_id)).first()
-            if not chat_session:
-                return APIResponse(status=status.HTTP_404_NOT_FOUND, 
-                                 message="Chat session not found", data=None)
-            session_id = chat_session.id
-
-            background_tasks.add_task(transcript_writer, session, {"id": str(uuid.uuid4()), "thread_id": session_id, "message": chat_request.user_input,
-                                                                    "sender": "User", "created_at": datetime.now(timezone.utc)})
-            
-        state = await request.app.state.graph.ainvoke(input_state, 
-                                                        config={"configurable": {"thread_id": thread_id}})
+        turn = await _prepare_chat_turn(session, current_user, chat_request)
+        if isinstance(turn, APIResponse):
+            return turn
+        input_state, thread_id, session_id, user_transcript = turn
+        
+        graph = request.app.state.graph
+        response = await seed_greeting(graph, thread_id) if chat_request is None else None
+        if response is None:
+            state = await graph.ainvoke(input_state, 
+                                        config={"configurable": {"thread_id": thread_id, "user_id": current_user.id}})
+            response = state["messages"][-1].content
             
+            if settings.compression_mode == "deferred" and needs_compression(state):
+                background_tasks.add_task(compress_thread_state, graph, thread_id, current_user.id)
 
-        background_tasks.add_task(transcript_writer, session, {"id": str(uuid.uuid4()), "thread_id": session_id, "message": state["messages"][-1].content,
-                                                                "sender": "AI", "created_at": datetime.now(timezone.utc)})
+        if user_transcript is not None:
+            transcript_buffer.add_transcript(user_transcript)
+        transcript_buffer.add_transcript({"id": str(uuid.uuid4()), "thread_id": session_id, "message": response,
+                                          "sender": "AI", "created_at": datetime.now(timezone.utc)})
 
         return APIResponse(status=status.HTTP_200_OK, message="Chat response generated successfully",
-                           data=ChatResponse(response=state["messages"][-1].content, thread_id=str(thread_id)).model_dump())
+                           data=ChatResponse(response=response, thread_id=str(thread_id)).model_dump())
 
+    except AdmissionRejected as e:
+        logger.warning(f"Chat request rejected for user {current_user.id}: {e}")
+        return _too_many_requests(e)
     except Exception as e:
         logger.error(f"Error in chat_endpoint: {e}")
         logger.error(traceback.format_exc())
         return APIResponse(status=status.HTTP_500_INTERNAL_SERVER_ERROR, 
                            message="Internal Server Error", data=None)
+
+
+@chatbot_app.post("/chat_stream")
+async def chat_stream_endpoint(request: Request, background_tasks: BackgroundTasks, chat_request: Optional[ChatRequest] = None, current_user: str = Depends(get_current_user),
+                               session: Session = Depends(get_session)):
+    """
+    Same contract as /chat, but the reply is pushed as Server-Sent Events:
+    `token` events while call_model streams, then a final `end` event carrying the ChatResponse.
+    """
+    try:
+        if isinstance(current_user, APIResponse):
+            return current_user
+        
+        if chat_request is not None or not greeting_pool:
+            llm_scheduler.check_capacity(current_user.id)
         
+        turn = await _prepare_chat_turn(session, current_user, chat_request)
+        if isinstance(turn, APIResponse):
+            return turn
+        input_state, thread_id, session_id, user_transcript = turn
+    
+    except AdmissionRejected as e:
+        logger.warning(f"Chat stream rejected for user {current_user.id}: {e}")
+        return _too_many_requests(e)
+    except Exception as e:
+        logger.error(f"Error in chat_stream_endpoint: {e}")
+        logger.error(traceback.format_exc())
+        return APIResponse(status=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+                           message="Internal Server Error", data=None)
+    
+    graph = request.app.state.graph
+    config = {"configurable": {"thread_id": thread_id, "user_id": current_user.id}}
+    
+    async def event_stream():
+        tokens = []
+        snapshot = None
+        try:
+            greeting = await seed_greeting(graph, thread_id) if chat_request is None else None
+            if greeting is not None:
+                tokens.append(greeting)
+                yield _sse_event("token", {"token": greeting})
+            else:
+                async for message_chunk, metadata in graph.astream(input_state, config=config, stream_mode="messages"):
+                    # Only forward live tokens of the reply; summarisation output and whole
+                    # messages echoed back from node updates are skipped.
+                    if metadata.get("langgraph_node") != "call_model" or not isinstance(message_chunk, AIMessageChunk):
+                        continue
+                    if not message_chunk.content:
+                        continue
+                    tokens.append(message_chunk.content)
+                    yield _sse_event("token", {"token": message_chunk.content})
+                # A checkpoint read per turn, so only taken when the deferred compression check needs it
+                # or when no reply tokens were streamed and the reply has to come from the state
+                if settings.compression_mode == "deferred" or not tokens:
+                    snapshot = await graph.aget_state(config)
+            
+            response = "".join(tokens) if tokens else snapshot.values["messages"][-1].content
+            
+            if user_transcript is not None:
+                transcript_buffer.add_transcript(user_transcript)
+            transcript_buffer.add_transcript({"id": str(uuid.uuid4()), "thread_id": session_id, "message": response,
+                                              "sender": "AI", "created_at": datetime.now(timezone.utc)})
+            
+            if settings.compression_mode == "deferred" and snapshot is not None and needs_compression(snapshot.values):
+                # Background tasks attached to a StreamingResponse run once the stream has finished
+                background_tasks.add_task(compress_thread_state, graph, thread_id, current_user.id)
+            
+            yield _sse_event("end", ChatResponse(response=response, thread_id=str(thread_id)).model_dump())
+        
+        except AdmissionRejected as e:
+            logger.warning(f"Chat stream rejected for user {current_user.id}: {e}")
+            yield _sse_event("error", {"status": status.HTTP_429_TOO_MANY_REQUESTS, "message": "Chat is busy, please retry later",
+                                       "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error in chat_stream_endpoint: {e}")
+            logger.error(traceback.format_exc())
+            yield _sse_event("error", {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "message": "Internal Server Error"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", background=background_tasks,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        
+
+@chatbot_app.post("/batch_chat")
+async def batch_chat_endpoint(request: Request, data: BatchChatRequest, current_user: str = Depends(get_current_user),
+                              session: Session = Depends(get_session)):
+    """
+    Run many chat turns through the graph with bounded concurrency and stream one NDJSON line per item
+    as it completes: {"index", "thread_id", "status", "response" | "message"}.
+    Items on the same thread run in request order; different threads run concurrently.
+    """
+    try:
+        if isinstance(current_user, APIResponse):
+            return current_user
+        
+        if len(data.items) > settings.batch_chat_max_items:
+            return APIResponse(status=status.HTTP_400_BAD_REQUEST,
+                               message=f"At most {settings.batch_chat_max_items} items per batch", data=None)
+        
+        # Resolve all existing threads with one query
+        requested = list({item.thread_id for item in data.items if item.thread_id})
+        session_ids = {}
+        if requested:
+            rows = await session.execute(select(ChatSession.thread_id, ChatSession.id)
+                                         .where(ChatSession.thread_id.in_(requested), ChatSession.user_id == current_user.id))
+            session_ids.update({thread_id: session_id for thread_id, session_id in rows})
+        
+        # index lists per thread, so turns on one thread never race on its checkpoint
+        threads = {}
+        for index, item in enumerate(data.items):
+            threads.setdefault(item.thread_id or f"new:{index}", []).append(index)
+        
+        # Sessions for new threads are created up front with one multi-row INSERT
+        new_threads = {key: (str(uuid.uuid4()), str(uuid.uuid4())) for key in threads if key.startswith("new:")}
+        if new_threads:
+            now = datetime.now(timezone.utc)
+            await session.execute(insert(ChatSession), [{"id": session_id, "user_id": current_user.id,
+                                                         "thread_id": thread_id, "created_at": now}
+                                                        for thread_id, session_id in new_threads.values()])
+            await session.commit()
+    
+    except Exception as e:
+        logger.error(f"Error in batch_chat_endpoint: {e}")
+        logger.error(traceback.format_exc())
+        return APIResponse(status=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+                           message="Internal Server Error", data=None)
+    
+    graph = request.app.state.graph
+    semaphore = asyncio.Semaphore(settings.batch_chat_max_concurrency)
+    results: asyncio.Queue = asyncio.Queue()
+    
+    async def run_item(index: int, thread_id: str, session_id: str):
+        item = data.items[index]
+        input_state = AgentState(messages=[], user_input=item.user_input, turns_to_compress=0, summary=None) \
+            if item.thread_id is None else {"user_input": item.user_input}
+        try:
+            async with semaphore:
+                state = await graph.ainvoke(input_state, config={"configurable": {"thread_id": thread_id, "user_id": current_user.id}})
+            response = state["messages"][-1].content
+            now = datetime.now(timezone.utc)
+            transcript_buffer.add_transcript({"id": str(uuid.uuid4()), "thread_id": session_id, "message": item.user_input,
+                                              "sender": "User", "created_at": now})
+            transcript_buffer.add_transcript({"id": str(uuid.uuid4()), "thread_id": session_id, "message": response,
+                                              "sender": "AI", "created_at": now + timedelta(microseconds=1)})
+            return {"index": index, "thread_id": thread_id, "status": status.HTTP_200_OK, "response": response}
+        except AdmissionRejected as e:
+            return {"index": index, "thread_id": thread_id, "status": status.HTTP_429_TOO_MANY_REQUESTS,
+                    "message": "Chat is busy, please retry later", "retry_after": e.retry_after}
+        except Exception as e:
+            logger.error(f"Error in batch_chat_endpoint item {index}: {e}")
+            logger.error(traceback.format_exc())
+            return {"index": index, "thread_id": thread_id, "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "message": "Internal Server Error"}
+    
+    async def run_thread(key: str, indexes):
+        thread_id = data.items[indexes[0]].thread_id
+        if thread_id is None:
+            thread_id, session_id = new_threads[key]
+        else:
+            session_id = session_ids.get(thread_id)
+        
+        for index in indexes:
+            if session_id is None:
+                await results.put({"index": index, "thread_id": thread_id, "status": status.HTTP_404_NOT_FOUND,
+                                   "message": "Chat session not found"})
+            else:
+                await results.put(await run_item(index, thread_id, session_id))
+    
+    async def ndjson_stream():
+        tasks = [asyncio.create_task(run_thread(key, indexes)) for key, indexes in threads.items()]
+        try:
+            for _ in range(len(data.items)):
+                yield json.dumps(await results.get(), default=str) + "\n"
+        finally:
+            # Client went away or we are done: stop any work still in flight
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
 
 @chatbot_app.post("/get_sessions")
 async def get_sessions_endpoint(data: ChatSessionRequest, current_user: str = Depends(get_current_user),
@@ -80,9 +314,10 @@ async def get_sessions_endpoint(data: ChatSessionRequest, current_user: str = De
         if isinstance(current_user, APIResponse):
             return current_user
         
-        sessions = get_sessions_be_user(session, current_user.id, data.page, data.page_size)
+        sessions = await get_sessions_be_user(session, current_user.id, data.page, data.page_size)
         
-        return APIResponse(status=status.HTTP_200_OK, message="Chat sessions retrieved successfully", data=sessions)
+        return APIResponse(status=status.HTTP_200_OK, message="Chat sessions retrieved successfully",
+                           data={"sessions": sessions})
     
     except Exception as e:
         logger.error(f"Error in get_sessions_endpoint: {e}")
@@ -97,9 +332,20 @@ async def get_transcripts_endpoint(data: ChatSessionRequest, current_user: str =
         if isinstance(current_user, APIResponse):
             return current_user
         
-        transcripts = get_transcripts_by_thread(session, data.thread_id, data.page, data.page_size)
+        # Transcripts are stored against the chat session id, not the LangGraph thread id
+        chat_session = await session.scalar(select(ChatSession).where(ChatSession.thread_id == str(data.thread_id),
+                                                                      ChatSession.user_id == current_user.id))
+        if not chat_session:
+            return APIResponse(status=status.HTTP_404_NOT_FOUND, message="Chat session not found", data=None)
+        
+        # Include this worker's not yet written transcripts (other workers flush within flush_interval)
+        if transcript_buffer.has_pending(chat_session.id):
+            await transcript_buffer.flush()
+        
+        transcripts = await get_transcripts_by_thread(session, chat_session.id, data.page, data.page_size)
         
-        return APIResponse(status=status.HTTP_200_OK, message="Chat transcripts retrieved successfully", data=transcripts)
+        return APIResponse(status=status.HTTP_200_OK, message="Chat transcripts retrieved successfully",
+                           data={"transcripts": transcripts})
     
     except Exception as e:
         logger.error(f"Error in get_transcripts_endpoint: {e}")
@@ -114,8 +360,11 @@ async def delete_session_endpoint(thread_id: str, current_user: str = Depends(ge
         if isinstance(current_user, APIResponse):
             return current_user
         
-        success = delete_session_by_thread(session, thread_id)
-        if success:
+        deleted_session_id = await delete_session_by_thread(session, thread_id, current_user.id)
+        if deleted_session_id:
+            # Transcripts still buffered for it would only fail their foreign key; ones already
+            # handed to the job queue are dead-lettered by write_transcript_batch
+            transcript_buffer.discard_session(deleted_session_id)
             return APIResponse(status=status.HTTP_204_NO_CONTENT, message="Chat session deleted successfully", data=None)
         else:
             return APIResponse(status=status.HTTP_404_NOT_FOUND, message="Chat session not found", data=None)
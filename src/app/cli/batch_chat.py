@@ -0,0 +1,98 @@
+"""
+Send bulk chat turns to /chatbot/batch_chat and write the NDJSON results as they arrive.
+
+    python -m app.cli.batch_chat questions.jsonl --token $TOKEN --output answers.jsonl
+    # long runs: renew the access token through /auth/refresh when it expires
+    python -m app.cli.batch_chat questions.jsonl --refresh-token $REFRESH_TOKEN --output answers.jsonl
+
+Each input line is {"user_input": "...", "thread_id": "..."}; leave out thread_id to start a new thread.
+Result lines carry the item's index within the whole input file.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Optional
+
+import httpx
+
+
+def read_items(path: str):
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+class Credentials:
+    """
+    Bearer token of the run. With a refresh token, a new access token is fetched when the current one expires;
+    refresh tokens rotate, so the one returned by each refresh is kept for the next.
+    """
+
+    def __init__(self, token: Optional[str], refresh_token: Optional[str]):
+        self.token = token
+        self.refresh_token = refresh_token
+
+    async def refresh(self, client: httpx.AsyncClient):
+        if self.refresh_token is None:
+            raise SystemExit("Access token expired; pass --refresh-token to renew it during the run")
+        response = await client.post("/auth/refresh", json={"refresh_token": self.refresh_token})
+        response.raise_for_status()
+        body = response.json()
+        if body["status"] != 200:
+            raise SystemExit(f"Token refresh failed: {body['message']}")
+        self.token = body["data"]["token_details"]["token"]
+        self.refresh_token = body["data"]["token_details"]["refresh_token"]
+
+
+async def run(items, url: str, credentials: Credentials, batch_size: int, output):
+    failed = 0
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        if credentials.token is None:
+            await credentials.refresh(client)
+        offset, refreshed = 0, False
+        while offset < len(items):
+            batch = items[offset:offset + batch_size]
+            async with client.stream("POST", "/chatbot/batch_chat", json={"items": batch},
+                                     headers={"Authorization": f"Bearer {credentials.token}"}) as response:
+                response.raise_for_status()
+                if not response.headers.get("content-type", "").startswith("application/x-ndjson"):
+                    # Validation and auth errors come back as a single APIResponse, before any item has run
+                    body = json.loads(await response.aread())
+                    # One refresh per batch: a fresh token that is still refused will not be fixed by another
+                    if body.get("status") == 401 and not refreshed:
+                        await credentials.refresh(client)
+                        refreshed = True
+                        continue
+                    raise SystemExit(f"Batch rejected: {json.dumps(body)}")
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    result["index"] += offset
+                    failed += result["status"] != 200
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+            offset, refreshed = offset + batch_size, False
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run bulk chat turns through /chatbot/batch_chat")
+    parser.add_argument("input", help="JSONL file of {user_input, thread_id?} items")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", help="bearer token from /auth/login")
+    parser.add_argument("--refresh-token", help="refresh token from /auth/login, used to renew the bearer token")
+    parser.add_argument("--batch-size", type=int, default=200, help="items per request")
+    parser.add_argument("--output", default="-", help="output file, '-' for stdout")
+    args = parser.parse_args()
+    if args.token is None and args.refresh_token is None:
+        parser.error("one of --token or --refresh-token is required")
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        failed = asyncio.run(run(read_items(args.input), args.url, Credentials(args.token, args.refresh_token),
+                                 args.batch_size, output))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,29 @@
+"""
+Prune LangGraph checkpoints, keeping the latest K per thread.
+
+    python -m app.cli.compact_checkpoints --keep 5 --batch-size 100
+
+Prints a JSON report of the rows and bytes reclaimed per table.
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.config import settings
+from app.services.checkpoint_maintenance_services import run_checkpoint_compaction
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact LangGraph checkpoint tables")
+    parser.add_argument("--keep", type=int, default=settings.checkpoint_keep_last,
+                        help="checkpoints to keep per thread")
+    parser.add_argument("--batch-size", type=int, default=settings.checkpoint_compaction_batch_size,
+                        help="(thread, namespace) pairs per transaction")
+    parser.add_argument("--pause", type=float, default=0.0,
+                        help="seconds to sleep between batches to throttle the load")
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_checkpoint_compaction(keep_last=args.keep, batch_size=args.batch_size,
+                                                   pause_seconds=args.pause, max_batches=args.max_batches))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,177 @@
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (BaseCheckpointSaver, ChannelVersions, Checkpoint,
+                                       CheckpointMetadata, CheckpointTuple)
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+class _CachedThread:
+    __slots__ = ("checkpoint_id", "config", "parent_config", "metadata", "payload", "size", "stored_at")
+
+    def __init__(self, checkpoint_id, config, parent_config, metadata, payload, size):
+        self.checkpoint_id = checkpoint_id
+        self.config = config
+        self.parent_config = parent_config
+        self.metadata = metadata
+        self.payload = payload
+        self.size = size
+        self.stored_at = time.monotonic()
+
+
+class CachedCheckpointSaver(BaseCheckpointSaver):
+    """
+    Write-through cache of the latest checkpoint of recently active threads, in front of another saver
+    (AsyncPostgresSaver). Every write still goes to the wrapped saver; reads of the latest checkpoint of a
+    cached thread are served from memory. Entries are kept serialized, which isolates them from in-place
+    mutation by graph nodes and gives an exact size for the memory limit.
+
+    The cache is per process: with several workers, route a thread to one worker or keep `ttl_seconds`
+    short, otherwise a worker can resume a thread from a checkpoint another worker has superseded.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, max_threads: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 300):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._threads: "OrderedDict[Tuple[str, str], _CachedThread]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    def stats(self) -> Dict[str, int]:
+        return {"threads": len(self._threads), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    # --- cache bookkeeping ---
+
+    def _evict(self, key):
+        entry = self._threads.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict_thread(self, thread_id: str):
+        for key in [key for key in self._threads if key[0] == str(thread_id)]:
+            self._evict(key)
+
+    def _store(self, key, config, parent_config, metadata, checkpoint: Checkpoint, pending_writes):
+        payload = self.serde.dumps_typed({"checkpoint": checkpoint,
+                                          "pending_writes": [list(write) for write in pending_writes or []]})
+        size = len(payload[1])
+        self._evict(key)
+        if size > self.max_bytes:
+            return
+
+        self._threads[key] = _CachedThread(checkpoint["id"], config, parent_config, dict(metadata), payload, size)
+        self._bytes += size
+        while self._threads and (len(self._threads) > self.max_threads or self._bytes > self.max_bytes):
+            self._evict(next(iter(self._threads)))
+
+    def _lookup(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        entry = self._threads.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.stored_at > self.ttl_seconds:
+            self._evict(key)
+            return None
+
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        if checkpoint_id is not None and checkpoint_id != entry.checkpoint_id:
+            return None
+
+        self._threads.move_to_end(key)
+        data = self.serde.loads_typed(entry.payload)
+        return CheckpointTuple(config=entry.config,
+                               checkpoint=data["checkpoint"],
+                               metadata=dict(entry.metadata),
+                               parent_config=entry.parent_config,
+                               pending_writes=[tuple(write) for write in data["pending_writes"]])
+
+    # --- async API used by the compiled graph ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached = self._lookup(config)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        checkpoint_tuple = await self.saver.aget_tuple(config)
+        # Read-through for "latest" lookups, e.g. the first turn on a thread after a restart
+        if checkpoint_tuple is not None and config["configurable"].get("checkpoint_id") is None:
+            self._store(self._key(config), checkpoint_tuple.config, checkpoint_tuple.parent_config,
+                        checkpoint_tuple.metadata, checkpoint_tuple.checkpoint, checkpoint_tuple.pending_writes)
+        return checkpoint_tuple
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in self.saver.alist(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        next_config = await self.saver.aput(config, checkpoint, metadata, new_versions)
+        configurable = config["configurable"]
+        parent_config = None
+        if configurable.get("checkpoint_id"):
+            parent_config = {"configurable": {"thread_id": configurable["thread_id"],
+                                              "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                                              "checkpoint_id": configurable["checkpoint_id"]}}
+        self._store(self._key(next_config), next_config, parent_config, metadata, checkpoint, [])
+        return next_config
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await self.saver.aput_writes(config, writes, task_id, task_path)
+        # Pending writes only matter while their checkpoint is the latest one; drop it rather than
+        # replicating the saver's upsert rules. The next aput re-populates the entry.
+        key = self._key(config)
+        entry = self._threads.get(key)
+        if entry is not None and entry.checkpoint_id == config["configurable"].get("checkpoint_id"):
+            self._evict(key)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._evict_thread(thread_id)
+        await self.saver.adelete_thread(thread_id)
+
+    # --- sync API, passed straight through ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.saver.get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        self._evict(self._key(config))
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        self._evict(self._key(config))
+        return self.saver.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._evict_thread(thread_id)
+        return self.saver.delete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import Optional
+from typing import Optional, List
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 import os
@@ -12,16 +12,42 @@ class Settings(BaseSettings):
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
-    access_token_expire_days: int = 30
+    access_token_expire_days: int = 30  # default for create_access_token; login tokens use access_token_expire_minutes
+    refresh_token_expire_days: int = 30
+    # A just-rotated refresh token is accepted again for this long instead of being treated as stolen
+    refresh_token_reuse_grace_seconds: int = 30
+    # Revoked refresh tokens are kept this long to detect their reuse, then swept
+    refresh_token_revoked_retention_hours: float = 24
     otp_cooldown_period_seconds: int = 30
     otp_length : int = 6
+    otp_expire_minutes: int = 10
+    # Expired OTPs and stale refresh tokens are deleted in the background; interval 0 disables the sweeper
+    expired_row_sweep_interval_seconds: float = 300
+    expired_row_sweep_batch_size: int = 1000
+    
+    # Resolved principals of get_current_user, so authenticated calls skip the user lookup
+    principal_cache_enabled: bool = True
+    principal_cache_ttl_seconds: float = 60.0
+    principal_cache_max_entries: int = 10000
+    
+    # bcrypt runs in a process pool; raising the cost rehashes existing passwords on their next login
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 0  # 0 = one per CPU core
+    password_hash_max_pending: int = 64
     
     email_from: str
     app_password: str
     email_port: int
     email_host: str
+    # "smtp" (pooled connections to email_host:email_port), "file" (mbox at email_file_path) or "memory"
+    email_backend: str = "smtp"
+    email_pool_size: int = 4
+    email_timeout_seconds: float = 30
+    email_noop_after_idle_seconds: float = 30
+    email_file_path: str = "sent_emails.mbox"
     
     app_name: str = "Chatbot FastAPI"
+    environment: str = "production"  # "development" / "test" turn on debugging aids such as the N+1 detector
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     log_file: str = "app.log"
     logs_directory: str = "logs"
@@ -29,8 +55,104 @@ class Settings(BaseSettings):
     
     company_name: str = "WannaBeAIops"
     
-    gemini_api_key: str
+    gemini_api_key: Optional[str] = None
     gemini_model: str = "gemini-flash-latest"
+    # Secondary models for hedged / fallback requests, e.g. '["gemini-2.5-flash", "gemini-2.5-flash-lite"]'
+    gemini_fallback_models: List[str] = []
+    llm_hedge_enabled: bool = True
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_min_delay_seconds: float = 0.5
+    llm_hedge_initial_delay_seconds: float = 4.0
+    
+    # "gemini", "fake" (offline stand-in, see app.core.fake_llm), "record" (gemini + write cassette)
+    # or "replay" (fake model answering from the cassette)
+    llm_backend: str = "gemini"
+    llm_cassette_path: str = "cassettes/llm.jsonl"
+    fake_llm_latency_distribution: str = "lognormal"
+    fake_llm_latency_mean_seconds: float = 0.8
+    fake_llm_latency_stddev_seconds: float = 0.3
+    fake_llm_tokens_per_second: float = 60.0
+    fake_llm_error_rate: float = 0.0
+    fake_llm_seed: Optional[int] = None
+    
+    # OpenTelemetry tracing; exporter is "console", "file" (JSON lines at tracing_file_path) or "otlp"
+    tracing_enabled: bool = False
+    tracing_exporter: str = "console"
+    tracing_file_path: str = "logs/traces.jsonl"
+    tracing_otlp_endpoint: Optional[str] = None
+    tracing_sample_ratio: float = 1.0
+    
+    # SQL statements slower than this are logged with their parameter types
+    db_slow_query_ms: float = 200.0
+    # Identical statements repeated this often within one request are reported as N+1 patterns
+    db_n_plus_one_threshold: int = 5
+    
+    # On-demand request profiling (needs pyinstrument): send `X-Profile: 1` and `X-Profile-Token`
+    profiling_enabled: bool = False
+    profiling_admin_token: Optional[str] = None
+    profiling_output_dir: str = "logs/profiles"
+    profiling_interval_seconds: float = 0.001
+    profiling_format: str = "speedscope"  # or "html"
+    # "inline": summarise inside the graph before call_model, "deferred": summarise after the response
+    compression_mode: str = "inline"
+    # Fold the oldest messages into the rolling summary once the estimated prompt exceeds this many tokens
+    context_token_budget: int = 3000
+    context_keep_recent_messages: int = 6
+    
+    # Admission control for model calls (see app.core.llm_scheduler)
+    llm_max_concurrency: int = 16
+    llm_max_queue_depth: int = 128
+    llm_max_queue_per_user: int = 8
+    
+    # Reply cache for context-free turns (see app.core.llm_cache); backend "memory" or "redis"
+    llm_cache_enabled: bool = True
+    llm_cache_backend: str = "memory"
+    llm_cache_ttl_seconds: float = 3600
+    llm_cache_max_entries: int = 10000
+    llm_cache_max_context_messages: int = 0
+    redis_url: Optional[str] = None
+    
+    # Token buckets on login/signup/resend_otp/forgot_password (see app.core.rate_limit); backend "memory" or "redis".
+    # The memory backend is per worker, so with N workers the effective limits are N times higher.
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    rate_limit_ip_burst: int = 20
+    rate_limit_ip_per_minute: float = 10
+    rate_limit_email_burst: int = 5
+    rate_limit_email_per_minute: float = 2
+    rate_limit_shards: int = 16
+    rate_limit_sweep_interval_seconds: float = 60
+    rate_limit_trusted_proxies: int = 0  # reverse proxies in front of the app that append to X-Forwarded-For
+    
+    # Greetings for new sessions are served from a pre-generated pool; size 0 disables it
+    greeting_pool_size: int = 8
+    greeting_max_uses: int = 50
+    greeting_pool_startup_timeout_seconds: float = 15.0
+    
+    batch_chat_max_items: int = 1000
+    batch_chat_max_concurrency: int = 4
+    
+    transcript_buffer_max_rows: int = 200
+    transcript_buffer_flush_interval_seconds: float = 2.0
+    transcript_buffer_max_pending_rows: int = 10000
+    
+    job_queue_enabled: bool = False
+    job_worker_concurrency: int = 4
+    job_poll_interval_seconds: float = 1.0
+    job_max_attempts: int = 5
+    job_retry_base_delay_seconds: float = 2.0
+    job_retry_max_delay_seconds: float = 300.0
+    job_lock_timeout_seconds: int = 300
+    job_worker_metrics_port: int = 0  # Prometheus endpoint of `python -m app.worker`; 0 disables it, give each worker on a host its own port
+    
+    checkpoint_keep_last: int = 5
+    checkpoint_compaction_batch_size: int = 100
+    # In-process cache of the latest checkpoint of active threads. Per worker, so only enable it
+    # with sticky routing of threads to workers (or a single worker).
+    checkpoint_cache_enabled: bool = False
+    checkpoint_cache_max_threads: int = 1000
+    checkpoint_cache_max_bytes: int = 64 * 1024 * 1024
+    checkpoint_cache_ttl_seconds: float = 300
     
 
     model_config = {
@@ -43,5 +165,45 @@ class Settings(BaseSettings):
 settings = Settings()
 
 
+def _build_chat_model(name: str):
+    from app.core.metrics import LLMMetricsCallback
+    model = _build_backend_model(name)
+    model.callbacks = [LLMMetricsCallback(model_name=name)]
+    if settings.tracing_enabled:
+        from app.core.tracing import LLMTracingCallback
+        model.callbacks.append(LLMTracingCallback(model_name=name))
+    return model
+
+
+def _build_backend_model(name: str):
+    if settings.llm_backend in ("fake", "replay"):
+        from app.core.fake_llm import FakeChatModel
+        return FakeChatModel(model_name=name,
+                             latency_distribution=settings.fake_llm_latency_distribution,
+                             latency_mean=settings.fake_llm_latency_mean_seconds,
+                             latency_stddev=settings.fake_llm_latency_stddev_seconds,
+                             tokens_per_second=settings.fake_llm_tokens_per_second,
+                             error_rate=settings.fake_llm_error_rate,
+                             seed=settings.fake_llm_seed,
+                             cassette_path=settings.llm_cassette_path if settings.llm_backend == "replay" else None)
+    
+    model = ChatGoogleGenerativeAI(model=name, api_key=settings.gemini_api_key)
+    if settings.llm_backend == "record":
+        from app.core.fake_llm import RecordingChatModel
+        return RecordingChatModel(model=model, model_name=name, cassette_path=settings.llm_cassette_path)
+    return model
+
+
 def get_model():
-    return ChatGoogleGenerativeAI(model=settings.gemini_model, api_key=settings.gemini_api_key)
\ No newline at end of file
+    models = [_build_chat_model(name) for name in [settings.gemini_model] + settings.gemini_fallback_models]
+    if len(models) == 1:
+        return models[0]
+    
+    from app.core.model_router import HedgedChatModel
+    from app.core.llm_scheduler import llm_scheduler
+    return HedgedChatModel(models=models,
+                           scheduler=llm_scheduler,
+                           hedge_enabled=settings.llm_hedge_enabled,
+                           hedge_percentile=settings.llm_hedge_percentile,
+                           hedge_min_delay=settings.llm_hedge_min_delay_seconds,
+                           hedge_initial_delay=settings.llm_hedge_initial_delay_seconds)
\ No newline at end of file
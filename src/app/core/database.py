@@ -1,22 +1,34 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
 from dotenv import load_dotenv
+from app.core.db_instrumentation import InstrumentedAsyncQueuePool, instrument_engine
 import os
 
 load_dotenv()
 
-engine = create_engine(os.getenv("database_url"),
-                       pool_pre_ping= True,
-                       pool_recycle= 3600,
-                       pool_size= 20,
-                       max_overflow= 0)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def to_async_url(database_url: str) -> str:
+    """
+    Point a plain postgresql:// URL at the async psycopg (v3) driver.
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if database_url.startswith(prefix):
+            return "postgresql+psycopg://" + database_url[len(prefix):]
+    return database_url
+
+
+engine = create_async_engine(to_async_url(os.getenv("database_url")),
+                             pool_pre_ping= True,
+                             pool_recycle= 3600,
+                             pool_size= 20,
+                             max_overflow= 0,
+                             poolclass= InstrumentedAsyncQueuePool)
+instrument_engine(engine)
+
+# expire_on_commit=False keeps loaded attributes usable after commit without an implicit (sync) refresh
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_session():
-    session = SessionLocal()
-    try:
+async def get_session():
+    async with SessionLocal() as session:
         yield session
-    finally:
-        session.close()
\ No newline at end of file
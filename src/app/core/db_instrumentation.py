@@ -0,0 +1,178 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.core.metrics import (DB_QUERY_SECONDS, DB_POOL_CHECKOUT_SECONDS, DB_POOL_WAITING, DB_POOL_TIMEOUTS,
+                              register_sqlalchemy_pool)
+from app.core.tracing import tracer
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "WITH"}
+# Transaction control repeats in every request and is never an N+1 pattern
+_NOT_REPEATABLE = {"BEGIN", "COMMIT", "ROLLBACK"}
+
+
+class QueryStats:
+    """
+    Statements issued while serving one request.
+    """
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Identical statements run at least `threshold` times, the usual signature of an N+1 access pattern.
+        """
+        return [(statement, count) for statement, count in self.statements.items()
+                if count >= threshold and statement_operation(statement) not in _NOT_REPEATABLE]
+
+
+# Set by QueryStatsMiddleware for the duration of a request; SQLAlchemy runs its events in the caller's context
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+
+def parameters_shape(parameters, executemany: bool = False) -> str:
+    """
+    Types of the bound parameters without their values, e.g. "{email: str, is_active_1: bool}".
+    """
+    if executemany and isinstance(parameters, (list, tuple)):
+        return f"{len(parameters)} x {parameters_shape(parameters[0]) if parameters else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that reports checkout time, waiters and timeouts.
+    """
+
+    def _do_get(self):
+        # Only a caller finding no idle connection and no overflow left blocks; the others take an idle
+        # connection or open a new one, and are not counted as waiting
+        blocking = self._pool.empty() and -1 < self._max_overflow <= self._overflow
+        if blocking:
+            DB_POOL_WAITING.labels("sqlalchemy").inc()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels("sqlalchemy").inc()
+            raise
+        finally:
+            if blocking:
+                DB_POOL_WAITING.labels("sqlalchemy").dec()
+            DB_POOL_CHECKOUT_SECONDS.labels("sqlalchemy").observe(time.perf_counter() - started)
+
+
+def statement_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return operation if operation in _OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine):
+    """
+    Time every statement of an (async) engine, with a span per statement when tracing is enabled,
+    and expose its pool occupancy.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    trace_statements = settings.tracing_enabled
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = None
+        if trace_statements:
+            span = tracer.start_span("db.query", kind=SpanKind.CLIENT,
+                                     attributes={"db.system": "postgresql",
+                                                 "db.operation.name": statement_operation(statement),
+                                                 "db.query.text": statement[:2000]})
+        conn.info.setdefault("query_started", []).append((time.perf_counter(), span))
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started, span = conn.info["query_started"].pop()
+        elapsed = time.perf_counter() - started
+        DB_QUERY_SECONDS.labels(statement_operation(statement)).observe(elapsed)
+        if span is not None:
+            span.end()
+
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+        if elapsed * 1000 >= settings.db_slow_query_ms:
+            logger.warning(f"Slow query ({elapsed * 1000:.1f} ms), parameters {parameters_shape(parameters, executemany)}: "
+                           f"{' '.join(statement.split())[:1000]}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            _, span = started.pop()
+            if span is not None:
+                span.record_exception(context.original_exception)
+                span.set_status(Status(StatusCode.ERROR, str(context.original_exception)))
+                span.end()
+
+    register_sqlalchemy_pool(sync_engine)
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware collecting QueryStats per request. When `expose_headers` is set, the count and total
+    time are returned in the `X-DB-Query-Count` / `X-DB-Query-Time-Ms` response headers (taken when the
+    headers are sent, so streamed responses report the statements run before streaming started).
+    When `detect_n_plus_one` is set, statements repeated `n_plus_one_threshold` times are logged as likely N+1s.
+    """
+
+    def __init__(self, app, expose_headers: bool, detect_n_plus_one: bool, n_plus_one_threshold: int):
+        self.app = app
+        self.expose_headers = expose_headers
+        self.detect_n_plus_one = detect_n_plus_one
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+
+        async def send_with_stats(message):
+            if self.expose_headers and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-query-time-ms", f"{stats.seconds * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _query_stats.reset(token)
+            if self.detect_n_plus_one:
+                for statement, count in stats.repeated(self.n_plus_one_threshold):
+                    logger.warning(f"Possible N+1 in {scope['method']} {scope['path']}: statement ran {count} times: "
+                                   f"{' '.join(statement.split())[:500]}")
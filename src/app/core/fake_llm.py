@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from app.utils.token_utils import estimate_tokens, estimate_message_tokens
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+_CANNED_REPLIES = [
+    "Hello! I'm your assistant. I can answer questions, explain concepts and help you work through problems.",
+    "Thanks for your message. Here is a short answer, followed by a few details you may find useful.",
+    "Good question. The short version is that it depends on your setup, but the usual approach works well.",
+    "Sure, let me walk you through it step by step so it is easy to follow and check.",
+]
+
+
+class FakeModelError(Exception):
+    """
+    Failure injected by FakeChatModel, standing in for provider errors such as 429s or 500s.
+    """
+
+
+def cassette_key(model_name: str, messages: List[BaseMessage]) -> str:
+    payload = json.dumps({"model": model_name,
+                          "messages": [[message.type, message.content] for message in messages]},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _usage(messages: List[BaseMessage], text: str) -> Dict[str, int]:
+    input_tokens, output_tokens = estimate_message_tokens(messages), estimate_tokens(text)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for the Gemini chat model, for load tests.
+
+    Replies are deterministic for a given prompt (or replayed from a cassette recorded by RecordingChatModel).
+    Time to first token follows `latency_distribution` ("constant", "uniform", "normal" or "lognormal",
+    parameterised by `latency_mean` / `latency_stddev` in seconds), the reply then streams at
+    `tokens_per_second`, and `error_rate` of the calls fail with FakeModelError.
+    """
+
+    model_name: str = "fake"
+    latency_distribution: str = "constant"
+    latency_mean: float = 0.5
+    latency_stddev: float = 0.1
+    tokens_per_second: float = 50.0
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+    cassette_path: Optional[str] = None
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _cassette: Dict[str, str] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._rng = random.Random(self.seed)
+        self._cassette = {}
+        if self.cassette_path and os.path.exists(self.cassette_path):
+            with open(self.cassette_path, encoding="utf-8") as handle:
+                for line in handle:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._cassette[record["key"]] = record["response"]
+            logger.info(f"Loaded {len(self._cassette)} recorded exchanges from {self.cassette_path}")
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        key = cassette_key(self.model_name, messages)
+        if key in self._cassette:
+            return self._cassette[key]
+        last_input = next((message.content for message in reversed(messages) if message.type == "human"), "")
+        reply = _CANNED_REPLIES[int(key, 16) % len(_CANNED_REPLIES)]
+        return f"{reply} (re: {str(last_input)[:80]})"
+
+    def _latency(self) -> float:
+        if self.latency_distribution == "uniform":
+            value = self._rng.uniform(self.latency_mean - self.latency_stddev, self.latency_mean + self.latency_stddev)
+        elif self.latency_distribution == "normal":
+            value = self._rng.gauss(self.latency_mean, self.latency_stddev)
+        elif self.latency_distribution == "lognormal":
+            # Parameterised so the distribution itself has the configured mean and standard deviation
+            variance = (self.latency_stddev / self.latency_mean) ** 2 if self.latency_mean > 0 else 0.0
+            sigma = (max(0.0, math.log1p(variance))) ** 0.5
+            mu = math.log(max(self.latency_mean, 1e-9)) - sigma ** 2 / 2
+            value = self._rng.lognormvariate(mu, sigma)
+        else:
+            value = self.latency_mean
+        return max(0.0, value)
+
+    def _maybe_fail(self):
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise FakeModelError("Injected fake model failure")
+
+    def _pieces(self, text: str) -> List[str]:
+        words = text.split(" ")
+        return [word if index == len(words) - 1 else word + " " for index, word in enumerate(words)]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _result(self, messages: List[BaseMessage], text: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=_usage(messages, text)))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._latency())
+        self._maybe_fail()
+        text = self._reply(messages)
+        time.sleep(self._token_delay() * len(self._pieces(text)))
+        return self._result(messages, text)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._latency())
+        self._maybe_fail()
+        text = self._reply(messages)
+        await asyncio.sleep(self._token_delay() * len(self._pieces(text)))
+        return self._result(messages, text)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._latency())
+        self._maybe_fail()
+        text = self._reply(messages)
+        for index, piece in enumerate(self._pieces(text)):
+            if index:
+                time.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=_usage(messages, text)))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._latency())
+        self._maybe_fail()
+        text = self._reply(messages)
+        for index, piece in enumerate(self._pieces(text)):
+            if index:
+                await asyncio.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=_usage(messages, text)))
+
+
+class RecordingChatModel(BaseChatModel):
+    """
+    Passes calls through to a real model and appends every exchange to a JSONL cassette,
+    which FakeChatModel(cassette_path=...) can replay offline.
+    """
+
+    model: BaseChatModel
+    model_name: str
+    cassette_path: str
+
+    # Async calls append from worker threads, so writes are serialised here rather than on the loop
+    _write_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording-chat"
+
+    def _record(self, messages: List[BaseMessage], response: str):
+        record = {"key": cassette_key(self.model_name, messages),
+                  "model": self.model_name,
+                  "messages": [[message.type, message.content] for message in messages],
+                  "response": response}
+        line = json.dumps(record, default=str) + "\n"
+        with self._write_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cassette_path)), exist_ok=True)
+            with open(self.cassette_path, "a", encoding="utf-8") as handle:
+                handle.write(line)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = self.model.invoke(messages, stop=stop, config={"callbacks": []}, **kwargs)
+        self._record(messages, message.content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = await self.model.ainvoke(messages, stop=stop, config={"callbacks": []}, **kwargs)
+        await asyncio.to_thread(self._record, messages, message.content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        pieces = []
+        async for chunk in self.model.astream(messages, stop=stop, config={"callbacks": []}, **kwargs):
+            pieces.append(chunk.content if isinstance(chunk.content, str) else "")
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(generation.text, chunk=generation)
+            yield generation
+        await asyncio.to_thread(self._record, messages, "".join(pieces))
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class InMemoryCacheBackend:
+    """
+    Per-process LRU with a TTL per entry and a cap on the number of entries.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """
+    Shared backend for multi-worker deployments. Entries expire through Redis TTLs; configure
+    `maxmemory-policy allkeys-lru` on the server for LRU eviction under the memory cap.
+    """
+
+    def __init__(self, url: str, prefix: str = "llmcache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("llm_cache_backend='redis' requires the 'redis' package") from e
+        self._client = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        await self._client.set(self.prefix + key, value, ex=max(1, int(ttl_seconds)))
+
+
+class ResponseCache:
+    """
+    Cache of model replies keyed on a normalised hash of the prompt. Only turns whose context carries
+    nothing thread-specific (no summary, at most `max_context_messages` earlier messages) are cached;
+    anything else is bypassed because the answer would not be reusable by another thread.
+    """
+
+    def __init__(self, backend, ttl_seconds: float, max_context_messages: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_context_messages = max_context_messages
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    @staticmethod
+    def _normalize(text) -> str:
+        if not isinstance(text, str):
+            text = json.dumps(text, sort_keys=True, default=str)
+        return _WHITESPACE.sub(" ", text).strip().casefold()
+
+    def make_key(self, system_prompt: str, summary: Optional[str], context: List, user_input: str) -> str:
+        payload = json.dumps({"system": self._normalize(system_prompt),
+                              "summary": self._normalize(summary or ""),
+                              "context": [[message.type, self._normalize(message.content)] for message in context],
+                              "input": self._normalize(user_input)})
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def is_cacheable(self, summary: Optional[str], context: List, user_input: Optional[str]) -> bool:
+        cacheable = bool(user_input) and not summary and len(context) <= self.max_context_messages
+        if not cacheable:
+            self.bypassed += 1
+        return cacheable
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # A cache outage must never fail the chat turn
+            self.errors += 1
+            logger.warning(f"LLM cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        try:
+            await self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        stats = {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed, "errors": self.errors,
+                 "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+        if isinstance(self.backend, InMemoryCacheBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    if not settings.llm_cache_enabled:
+        return None
+    if settings.llm_cache_backend == "redis":
+        backend = RedisCacheBackend(settings.redis_url)
+    else:
+        backend = InMemoryCacheBackend(max_entries=settings.llm_cache_max_entries)
+    return ResponseCache(backend, ttl_seconds=settings.llm_cache_ttl_seconds,
+                         max_context_messages=settings.llm_cache_max_context_messages)
+
+
+response_cache = build_response_cache()
@@ -0,0 +1,160 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when the LLM wait queue is full. `retry_after` is a whole number of seconds.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM admission queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class FairShareScheduler:
+    """
+    Admission control for the shared chat model.
+
+    At most `max_concurrency` calls run at once. Callers beyond that wait in one FIFO queue per user,
+    and a freed slot goes to the next user in round-robin order, so one user's burst cannot starve others.
+    Once `max_queue_depth` callers are waiting (or `max_queue_per_user` for that user), new callers are
+    rejected immediately with AdmissionRejected instead of piling up on the provider.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_depth: int, max_queue_per_user: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_per_user = max_queue_per_user
+        self._active = 0
+        self._depth = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        # Users with waiters, in the order they will be served
+        self._turns: "OrderedDict[str, None]" = OrderedDict()
+        # Exponentially weighted averages, used for stats and the Retry-After estimate
+        self._avg_wait = 0.0
+        self._avg_service = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    def stats(self) -> Dict:
+        return {"active": self._active,
+                "queue_depth": self._depth,
+                "queued_users": len(self._turns),
+                "avg_wait_seconds": round(self._avg_wait, 4),
+                "avg_service_seconds": round(self._avg_service, 4),
+                "admitted": self.admitted,
+                "rejected": self.rejected}
+
+    def retry_after(self) -> int:
+        # Time for the current backlog to drain through the available slots
+        return max(1, math.ceil(self._avg_service * (self._depth + 1) / max(1, self.max_concurrency)))
+
+    def check_capacity(self, user_id: Optional[str] = None):
+        """
+        Cheap pre-flight check so endpoints can shed load before doing any DB or graph work.
+        """
+        if self._active < self.max_concurrency and not self._depth:
+            return
+        if self._depth >= self.max_queue_depth or len(self._queues.get(str(user_id), ())) >= self.max_queue_per_user:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after())
+
+    def try_acquire(self) -> bool:
+        """
+        Take a free slot without queueing, for speculative work such as hedged requests. Fails while
+        anyone is waiting, so it never takes a slot ahead of a queued caller. Pair with release().
+        """
+        if self._active < self.max_concurrency and not self._depth:
+            self._active += 1
+            self._record_admission(0.0)
+            return True
+        return False
+
+    async def acquire(self, user_id: Optional[str] = None):
+        user = str(user_id)
+        enqueued_at = time.monotonic()
+
+        if self._active < self.max_concurrency and not self._depth:
+            self._active += 1
+            self._record_admission(0.0)
+            return
+
+        self.check_capacity(user)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append(waiter)
+        self._turns.setdefault(user, None)
+        self._depth += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self.release()
+            else:
+                self._remove_waiter(user, waiter)
+            raise
+        self._record_admission(time.monotonic() - enqueued_at)
+
+    def release(self, service_seconds: Optional[float] = None):
+        if service_seconds is not None:
+            self._avg_service = 0.9 * self._avg_service + 0.1 * service_seconds
+
+        while self._turns:
+            user = next(iter(self._turns))
+            queue = self._queues[user]
+            waiter = queue.popleft()
+            self._depth -= 1
+            # Round robin: the user goes to the back of the line if they still have waiters
+            del self._turns[user]
+            if queue:
+                self._turns[user] = None
+            else:
+                del self._queues[user]
+            if not waiter.cancelled():
+                # Hand the slot straight to the waiter, `_active` is unchanged
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _remove_waiter(self, user: str, waiter: asyncio.Future):
+        queue = self._queues.get(user)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._depth -= 1
+        if not queue:
+            del self._queues[user]
+            self._turns.pop(user, None)
+
+    def _record_admission(self, waited: float):
+        self.admitted += 1
+        self._avg_wait = 0.9 * self._avg_wait + 0.1 * waited
+
+    @asynccontextmanager
+    async def admit(self, user_id: Optional[str] = None):
+        await self.acquire(user_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+llm_scheduler = FairShareScheduler(max_concurrency=settings.llm_max_concurrency,
+                                   max_queue_depth=settings.llm_max_queue_depth,
+                                   max_queue_per_user=settings.llm_max_queue_per_user)
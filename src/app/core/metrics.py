@@ -0,0 +1,155 @@
+import time
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+# Buckets in seconds; LLM calls need a longer tail than the DB
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+GRAPH_NODE_SECONDS = Histogram("chatbot_graph_node_seconds", "LangGraph node execution time",
+                               ["node", "outcome"], buckets=_SLOW_BUCKETS)
+
+LLM_REQUEST_SECONDS = Histogram("chatbot_llm_request_seconds", "Chat model call time, start to last token",
+                                ["model", "outcome"], buckets=_SLOW_BUCKETS)
+LLM_FIRST_TOKEN_SECONDS = Histogram("chatbot_llm_first_token_seconds", "Chat model time to first streamed token",
+                                    ["model"], buckets=_SLOW_BUCKETS)
+LLM_TOKENS = Counter("chatbot_llm_tokens_total", "Tokens reported by the chat model", ["model", "direction"])
+LLM_TOKENS_PER_REQUEST = Histogram("chatbot_llm_tokens_per_request", "Tokens per chat model call",
+                                   ["model", "direction"], buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384))
+
+DB_QUERY_SECONDS = Histogram("chatbot_db_query_seconds", "SQLAlchemy statement execution time",
+                             ["operation"], buckets=_FAST_BUCKETS)
+DB_POOL_CHECKOUT_SECONDS = Histogram("chatbot_db_pool_checkout_seconds", "Time to get a connection from the pool",
+                                     ["pool"], buckets=_FAST_BUCKETS)
+DB_POOL_WAITING = Gauge("chatbot_db_pool_waiting", "Callers waiting for a pool connection", ["pool"])
+DB_POOL_TIMEOUTS = Counter("chatbot_db_pool_timeouts_total", "Pool checkouts that timed out", ["pool"])
+
+SMTP_SEND_SECONDS = Histogram("chatbot_smtp_send_seconds", "Email send time through the email transport",
+                              ["outcome"], buckets=_SLOW_BUCKETS)
+
+RATE_LIMIT_REJECTIONS = Counter("chatbot_rate_limit_rejections_total", "Requests rejected by the rate limiter",
+                                ["path", "scope"])
+
+BACKGROUND_FAILURES = Counter("chatbot_background_task_failures_total", "Background work that failed", ["task"])
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Records latency, time to first token and token usage of one chat model.
+    Attached to each underlying model, so hedged and fallback attempts are measured separately.
+    """
+
+    run_inline = True
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        # run_id -> (started, first token seen)
+        self._runs: Dict[UUID, list] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any):
+        self._runs[run_id] = [time.perf_counter(), False]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.get(run_id)
+        if run is not None and not run[1]:
+            run[1] = True
+            LLM_FIRST_TOKEN_SECONDS.labels(self.model_name).observe(time.perf_counter() - run[0])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            LLM_REQUEST_SECONDS.labels(self.model_name, "ok").observe(time.perf_counter() - run[0])
+
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for direction, key in (("input", "input_tokens"), ("output", "output_tokens")):
+                    if usage.get(key):
+                        LLM_TOKENS.labels(self.model_name, direction).inc(usage[key])
+                        LLM_TOKENS_PER_REQUEST.labels(self.model_name, direction).observe(usage[key])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            # Losing hedged attempts are cancelled, which is not a model failure
+            outcome = "cancelled" if type(error).__name__ == "CancelledError" else "error"
+            LLM_REQUEST_SECONDS.labels(self.model_name, outcome).observe(time.perf_counter() - run[0])
+
+
+def timed_node(name: str, node):
+    """
+    Wrap an async graph node so its run time lands in GRAPH_NODE_SECONDS.
+    """
+    async def wrapper(state, config):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await node(state, config)
+            outcome = "ok"
+            return result
+        finally:
+            GRAPH_NODE_SECONDS.labels(name, outcome).observe(time.perf_counter() - started)
+    wrapper.__name__ = getattr(node, "__name__", name)
+    return wrapper
+
+
+class CheckpointPoolCollector:
+    """
+    Exposes psycopg AsyncConnectionPool.get_stats() of the LangGraph checkpointer pool at scrape time.
+    """
+
+    _GAUGES = {"pool_size": "Connections open", "pool_available": "Connections idle in the pool",
+               "requests_waiting": "Callers waiting for a connection"}
+    _COUNTERS = {"requests_num": "Connection requests", "requests_queued": "Requests that had to wait",
+                 "requests_wait_ms": "Total time spent waiting, ms",
+                 "requests_errors": "Requests that failed, including timeouts",
+                 "connections_errors": "Failed connection attempts", "connections_lost": "Connections found broken"}
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def collect(self):
+        stats = self.pool.get_stats()
+        for key, documentation in self._GAUGES.items():
+            yield GaugeMetricFamily(f"chatbot_checkpoint_pool_{key}", documentation, value=stats.get(key, 0))
+        for key, documentation in self._COUNTERS.items():
+            yield CounterMetricFamily(f"chatbot_checkpoint_pool_{key}", documentation, value=stats.get(key, 0))
+        in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+        yield GaugeMetricFamily("chatbot_checkpoint_pool_in_use", "Connections checked out", value=in_use)
+
+
+class SQLAlchemyPoolCollector:
+    """
+    Exposes the SQLAlchemy QueuePool occupancy at scrape time.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        yield GaugeMetricFamily("chatbot_db_pool_size", "Configured pool size", value=pool.size())
+        yield GaugeMetricFamily("chatbot_db_pool_in_use", "Connections checked out", value=pool.checkedout())
+        yield GaugeMetricFamily("chatbot_db_pool_idle", "Connections idle in the pool", value=pool.checkedin())
+        yield GaugeMetricFamily("chatbot_db_pool_overflow", "Connections open beyond pool_size",
+                                value=max(0, pool.overflow()))
+
+
+_checkpoint_collector: Optional[CheckpointPoolCollector] = None
+
+
+def register_checkpoint_pool(pool):
+    global _checkpoint_collector
+    if _checkpoint_collector is not None:
+        REGISTRY.unregister(_checkpoint_collector)
+    _checkpoint_collector = CheckpointPoolCollector(pool)
+    REGISTRY.register(_checkpoint_collector)
+
+
+def register_sqlalchemy_pool(engine):
+    REGISTRY.register(SQLAlchemyPoolCollector(engine))
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+# Inner calls do not inherit the caller's callbacks (e.g. LangGraph's message stream), so only the router's
+# own run forwards tokens, and only those of the winning request. Callbacks attached to the inner models
+# themselves (LLMMetricsCallback, LLMTracingCallback) still fire for every attempt, losing hedges included,
+# which is what gives per-model latency and usage.
+_QUIET = {"callbacks": []}
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Routes a request over an ordered list of chat models.
+
+    The first model gets the request. If it has not answered (for streams: produced its first chunk)
+    within the hedge delay, the same request is also sent to the next model, and so on. The first answer
+    wins and the other requests are cancelled. A model that fails hands over to the next one straight away.
+
+    The hedge delay is the `hedge_percentile` of recently observed answer latencies, never below
+    `hedge_min_delay`, and `hedge_initial_delay` until `min_samples` have been seen. Streams (time to
+    first chunk) and invocations (time to the full answer) keep separate windows.
+
+    The caller's admission slot covers the first request and failovers, which replace a finished request.
+    A hedge runs alongside it, so with a `scheduler` it needs a free slot of its own (taken without queueing,
+    held until the race ends) and is skipped while the scheduler is saturated.
+    """
+
+    models: List[BaseChatModel]
+    scheduler: Optional[Any] = None
+    hedge_enabled: bool = True
+    hedge_percentile: float = 95.0
+    hedge_min_delay: float = 0.5
+    hedge_initial_delay: float = 4.0
+    min_samples: int = 20
+    window: int = 500
+
+    _latencies: Dict[str, Deque[float]] = PrivateAttr(default=None)
+    _stats: Dict[str, int] = PrivateAttr(default=None)
+    _closing: Set[asyncio.Task] = PrivateAttr(default_factory=set)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._latencies = {kind: deque(maxlen=self.window) for kind in ("invoke", "stream")}
+        self._stats = {"requests": 0, "hedged": 0, "hedges_skipped": 0, "failovers": 0, "won_by_secondary": 0}
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-router"
+
+    def stats(self) -> Dict:
+        return {**self._stats, "hedge_delay_seconds": {kind: round(self.hedge_delay(kind), 4) for kind in self._latencies}}
+
+    def hedge_delay(self, kind: str = "invoke") -> float:
+        latencies = self._latencies[kind]
+        if len(latencies) < self.min_samples:
+            return self.hedge_initial_delay
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return max(self.hedge_min_delay, ordered[index])
+
+    def _discard(self, task: asyncio.Task, dispose: Optional[Callable[[Any], Awaitable[Any]]]):
+        # A losing request may already have produced a result (e.g. an open stream); release it once it settles
+        if dispose is None or task.cancelled() or task.exception() is not None:
+            return
+        closing = asyncio.ensure_future(dispose(task.result()))
+        self._closing.add(closing)
+        closing.add_done_callback(self._closing.discard)
+
+    async def _race(self, call: Callable[[BaseChatModel], Awaitable[Any]], kind: str = "invoke",
+                    dispose: Optional[Callable[[Any], Awaitable[Any]]] = None):
+        """
+        Run `call` against the models as described above and return the first result. Results of losing
+        requests, including ones that complete after the winner, are passed to `dispose`.
+        """
+        started = time.monotonic()
+        pending: Dict[asyncio.Task, int] = {}
+        next_model = 0
+        hedge_slots = 0
+        last_error: Optional[BaseException] = None
+        self._stats["requests"] += 1
+
+        def launch():
+            nonlocal next_model
+            pending[asyncio.ensure_future(call(self.models[next_model]))] = next_model
+            next_model += 1
+
+        launch()
+        try:
+            while pending:
+                can_hedge = self.hedge_enabled and next_model < len(self.models)
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(kind) if can_hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self.scheduler is not None and not self.scheduler.try_acquire():
+                        self._stats["hedges_skipped"] += 1
+                        continue
+                    hedge_slots += self.scheduler is not None
+                    logger.info(f"No answer after {self.hedge_delay(kind):.2f}s, hedging to model #{next_model}")
+                    self._stats["hedged"] += 1
+                    launch()
+                    continue
+
+                for task in done:
+                    index = pending.pop(task)
+                    if task.exception() is None:
+                        self._latencies[kind].append(time.monotonic() - started)
+                        if index:
+                            self._stats["won_by_secondary"] += 1
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"Model #{index} failed: {last_error}")
+
+                if not pending and next_model < len(self.models):
+                    self._stats["failovers"] += 1
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(lambda task: self._discard(task, dispose))
+            for _ in range(hedge_slots):
+                self.scheduler.release()
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        # Sync callers get plain failover, hedging needs the event loop
+        last_error = None
+        for index, model in enumerate(self.models):
+            try:
+                message = model.invoke(messages, stop=stop, config=_QUIET, **kwargs)
+                return ChatResult(generations=[ChatGeneration(message=message)])
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Model #{index} failed: {e}")
+        raise last_error
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = await self._race(lambda model: model.ainvoke(messages, stop=stop, config=_QUIET, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async def first_chunk(model: BaseChatModel):
+            stream = model.astream(messages, stop=stop, config=_QUIET, **kwargs).__aiter__()
+            return stream, await anext(stream, None)
+
+        # Hedge on time to first chunk; once a stream has produced output we stay with it
+        stream, chunk = await self._race(first_chunk, kind="stream", dispose=lambda result: result[0].aclose())
+        try:
+            while chunk is not None:
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(generation.text, chunk=generation)
+                yield generation
+                chunk = await anext(stream, None)
+        finally:
+            await stream.aclose()
@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.schemas.user import CurrentUser
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of resolved principals keyed by token subject (email), each entry valid for `ttl_seconds`.
+
+    Account changes must call invalidate(). A lookup that started before an invalidation does not
+    repopulate the cache with what it read: callers pass the generation() taken before their query to set().
+    The cache is per process, so with several workers `ttl_seconds` bounds how long another worker
+    can keep accepting a deleted or deactivated account.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, CurrentUser]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str) -> Optional[CurrentUser]:
+        entry = self._entries.get(subject)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[subject]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return entry[1]
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, subject: str, principal: CurrentUser, generation: int):
+        if generation != self._generation:
+            return
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        self._generation += 1
+        self._entries.pop(subject, None)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache(max_entries=settings.principal_cache_max_entries,
+                                 ttl_seconds=settings.principal_cache_ttl_seconds) \
+    if settings.principal_cache_enabled else None
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import re
+import secrets
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling a single request with pyinstrument when it carries `X-Profile: 1`
+    and a matching `X-Profile-Token`. The profile (speedscope JSON or HTML) is written to
+    `output_dir` and its file name returned in the `X-Profile-File` response header.
+
+    Requests without the header pass straight through. One request is profiled at a time;
+    others asking meanwhile get `X-Profile: busy` and run unprofiled.
+    """
+
+    def __init__(self, app, admin_token: str, output_dir: str, interval: float, output_format: str):
+        try:
+            import pyinstrument  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("profiling_enabled requires the 'pyinstrument' package") from e
+        self.app = app
+        # Compared as bytes: compare_digest raises TypeError on str holding non-ASCII characters
+        self.admin_token = admin_token.encode()
+        self.output_dir = output_dir
+        self.interval = interval
+        self.output_format = output_format
+        self._busy = False
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _requested(self, scope) -> bool:
+        headers = dict(scope.get("headers", []))
+        if headers.get(b"x-profile") != b"1":
+            return False
+        if not secrets.compare_digest(headers.get(b"x-profile-token", b""), self.admin_token):
+            logger.warning(f"Profiling requested for {scope['path']} with an invalid token")
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            return await self.app(scope, receive, send)
+
+        if self._busy:
+            async def send_busy(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile", b"busy")]}
+                await send(message)
+            return await self.app(scope, receive, send_busy)
+
+        from pyinstrument import Profiler
+
+        extension = "html" if self.output_format == "html" else "speedscope.json"
+        file_name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{_UNSAFE.sub('_', scope['path']).strip('_')}" \
+                    f"-{secrets.token_hex(3)}.{extension}"
+
+        async def send_with_file(message):
+            if message["type"] == "http.response.start":
+                message = {**message,
+                           "headers": list(message.get("headers", [])) + [(b"x-profile-file", file_name.encode())]}
+            await send(message)
+
+        # async_mode="enabled" follows this request's task across awaits, so time spent waiting on the DB
+        # or the model shows up as await frames instead of being attributed to other requests
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        self._busy = True
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_file)
+        finally:
+            profiler.stop()
+            self._busy = False
+            await asyncio.to_thread(self._write, profiler, file_name)
+
+    def _write(self, profiler, file_name: str) -> Optional[str]:
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        renderer = HTMLRenderer() if self.output_format == "html" else SpeedscopeRenderer()
+        path = os.path.join(self.output_dir, file_name)
+        try:
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(profiler.output(renderer))
+            logger.info(f"Request profile written to {path}")
+            return path
+        except Exception as e:
+            logger.error(f"Could not write request profile {path}: {e}")
+            return None
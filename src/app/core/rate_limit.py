@@ -0,0 +1,263 @@
+import json
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import jwt
+
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+# Limited endpoints -> body field identifying the account. resend_otp only carries the signup/reset
+# token, whose subject is read without verifying the signature (the endpoint verifies it afterwards)
+_LIMITED_PATHS = {"/auth/login": "email",
+                  "/auth/signup": "email",
+                  "/auth/forgot_password": "email",
+                  "/auth/resend_otp": "unique_token"}
+# Auth bodies are a few hundred bytes; larger ones are rejected with 413 rather than passed on without
+# an email, which would let a padded body skip the per-email bucket
+_MAX_INSPECTED_BODY = 16 * 1024
+
+_REJECTION = json.dumps({"status": 429, "message": "Too many requests, please retry later", "data": None}).encode()
+_TOO_LARGE = json.dumps({"status": 413, "message": "Request body too large", "data": None}).encode()
+
+
+class InMemoryRateLimitBackend:
+    """
+    Per-process token buckets, spread over `shards` dicts by key hash. A check touches one bucket;
+    idle buckets (refilled to capacity) are evicted one shard at a time so a sweep never walks every key at once.
+    """
+
+    def __init__(self, shards: int, sweep_interval_seconds: float):
+        self._shards: List[Dict[str, list]] = [{} for _ in range(max(1, shards))]
+        self._sweep_every = sweep_interval_seconds / len(self._shards)
+        self._next_sweep = time.monotonic() + self._sweep_every
+        self._sweep_shard = 0
+
+    async def acquire(self, key: str, capacity: int, refill_per_second: float) -> float:
+        """
+        Take one token. Returns 0 when allowed, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        shard = self._shards[hash(key) % len(self._shards)]
+        bucket = shard.get(key)  # [tokens, updated, refilled to capacity at]
+        tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill_per_second
+        shard[key] = [tokens, now, now + (capacity - tokens) / refill_per_second]
+        return wait
+
+    def _sweep(self, now: float):
+        # A bucket that has refilled to capacity is indistinguishable from a new one
+        shard = self._shards[self._sweep_shard]
+        for key in [key for key, bucket in shard.items() if bucket[2] <= now]:
+            del shard[key]
+        self._sweep_shard = (self._sweep_shard + 1) % len(self._shards)
+        self._next_sweep = now + self._sweep_every
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+
+class RedisRateLimitBackend:
+    """
+    Buckets shared by all workers, updated atomically by a Lua script using the Redis clock.
+    """
+
+    _SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("rate_limit_backend='redis' requires the 'redis' package") from e
+        self._client = redis.from_url(url, decode_responses=True)
+        self._script = self._client.register_script(self._SCRIPT)
+        self.prefix = prefix
+
+    async def acquire(self, key: str, capacity: int, refill_per_second: float) -> float:
+        return float(await self._script(keys=[self.prefix + key], args=[capacity, refill_per_second]))
+
+
+class RateLimiter:
+    """
+    Per-IP and per-email token buckets for the auth endpoints. Each endpoint has its own buckets.
+    A failing shared backend lets requests through rather than locking everyone out.
+    """
+
+    def __init__(self, backend, ip_burst: int, ip_per_minute: float, email_burst: int, email_per_minute: float):
+        self.backend = backend
+        self.ip_burst = ip_burst
+        self.ip_rate = ip_per_minute / 60
+        self.email_burst = email_burst
+        self.email_rate = email_per_minute / 60
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    async def check(self, path: str, ip: str, email: Optional[str]) -> float:
+        """
+        0 when the request may proceed, otherwise the seconds to wait before retrying.
+        """
+        try:
+            wait = await self.backend.acquire(f"{path}:ip:{ip}", self.ip_burst, self.ip_rate)
+            scope = "ip"
+            if not wait and email:
+                wait = await self.backend.acquire(f"{path}:email:{email}", self.email_burst, self.email_rate)
+                scope = "email"
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Rate limit backend failed, letting the request through: {e}")
+            return 0.0
+        if wait:
+            self.rejected += 1
+            RATE_LIMIT_REJECTIONS.labels(path, scope).inc()
+        else:
+            self.allowed += 1
+        return wait
+
+    def stats(self) -> Dict:
+        stats = {"allowed": self.allowed, "rejected": self.rejected, "errors": self.errors}
+        if isinstance(self.backend, InMemoryRateLimitBackend):
+            stats["buckets"] = len(self.backend)
+        return stats
+
+
+def _email_from_body(body: bytes, field: str) -> Optional[str]:
+    try:
+        value = json.loads(body).get(field)
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(value, str):
+        return None
+    if field == "unique_token":
+        try:
+            value = jwt.decode(value, options={"verify_signature": False}).get("sub")
+        except jwt.PyJWTError:
+            return None
+        if not isinstance(value, str):
+            return None
+    return value.strip().lower() or None
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware applying the RateLimiter to the auth endpoints before routing, so rejected
+    requests never reach body validation, the database, bcrypt or SMTP. Rejections get HTTP 429 with
+    an APIResponse-shaped body and a `Retry-After` header; bodies too large to inspect get HTTP 413.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, trusted_proxies: int):
+        self.app = app
+        self.limiter = limiter
+        self.trusted_proxies = trusted_proxies
+
+    def _client_ip(self, scope) -> str:
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        if self.trusted_proxies <= 0:
+            return peer
+        # Each proxy appends the address it received the request from, so the client is the entry added by
+        # the outermost trusted proxy, `trusted_proxies` from the right. Entries further left are client-controlled.
+        forwarded = [entry.strip()
+                     for key, value in scope.get("headers", []) if key == b"x-forwarded-for"
+                     for entry in value.decode("latin-1").split(",")]
+        if len(forwarded) < self.trusted_proxies:
+            return peer
+        return forwarded[-self.trusted_proxies] or peer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in _LIMITED_PATHS:
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        messages, body, too_large = await self._read_body(scope, receive)
+        if too_large:
+            return await self._reject(send, 413, _TOO_LARGE)
+        email = _email_from_body(body, _LIMITED_PATHS[path]) if body is not None else None
+
+        wait = await self.limiter.check(path, self._client_ip(scope), email)
+        if wait:
+            return await self._reject(send, 429, _REJECTION, [(b"retry-after", str(max(1, math.ceil(wait))).encode())])
+
+        async def replay():
+            # Hand the already-read body to the app, then continue with the real channel
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    @staticmethod
+    async def _reject(send, status: int, body: bytes, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())] + (headers or [])})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _read_body(scope, receive) -> Tuple[List[Dict], Optional[bytes], bool]:
+        """
+        (messages consumed from `receive`, body or None when the client disconnected, whether it is too large)
+        """
+        for key, value in scope.get("headers", []):
+            if key == b"content-length" and value.isdigit() and int(value) > _MAX_INSPECTED_BODY:
+                return [], None, True
+
+        messages, chunks, size = [], [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                return messages, None, False
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > _MAX_INSPECTED_BODY:
+                return messages, None, True
+            if not message.get("more_body", False):
+                return messages, b"".join(chunks), False
+
+
+def build_rate_limiter() -> Optional[RateLimiter]:
+    if not settings.rate_limit_enabled:
+        return None
+    if settings.rate_limit_backend == "redis":
+        backend = RedisRateLimitBackend(settings.redis_url)
+    else:
+        backend = InMemoryRateLimitBackend(shards=settings.rate_limit_shards,
+                                           sweep_interval_seconds=settings.rate_limit_sweep_interval_seconds)
+    return RateLimiter(backend,
+                       ip_burst=settings.rate_limit_ip_burst,
+                       ip_per_minute=settings.rate_limit_ip_per_minute,
+                       email_burst=settings.rate_limit_email_burst,
+                       email_per_minute=settings.rate_limit_email_per_minute)
+
+
+rate_limiter = build_rate_limiter()
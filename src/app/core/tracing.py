@@ -0,0 +1,173 @@
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.core.config import settings
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+# A no-op tracer until setup_tracing() installs a provider, so instrumented code costs next to nothing
+tracer = trace.get_tracer("chatbot")
+
+# Key under which the trace context of the enqueuing request travels inside a job payload
+TRACE_CONTEXT_KEY = "_trace"
+
+
+def _build_exporter():
+    exporter = settings.tracing_exporter
+    if exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError as e:
+            raise RuntimeError("tracing_exporter='otlp' requires the 'opentelemetry-exporter-otlp' package") from e
+        return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint) if settings.tracing_otlp_endpoint \
+            else OTLPSpanExporter()
+
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    if exporter == "file":
+        # One JSON span per line, readable offline
+        handle = open(settings.tracing_file_path, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=handle, formatter=lambda span: span.to_json(indent=None) + "\n")
+    return ConsoleSpanExporter()
+
+
+def setup_tracing(service_name: str):
+    """
+    Install the global tracer provider with the configured exporter. No-op unless tracing is enabled.
+    """
+    if not settings.tracing_enabled:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}),
+                              sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)))
+    provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing enabled for {service_name}, exporting to {settings.tracing_exporter}")
+
+
+def shutdown_tracing():
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+def inject_trace_context(payload: Dict) -> Dict:
+    """
+    Copy of `payload` carrying the current trace context, for work that continues in another process.
+    """
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return {**payload, TRACE_CONTEXT_KEY: carrier} if carrier else payload
+
+
+def extract_trace_context(payload: Dict):
+    """
+    (payload without the trace context, parent context or None)
+    """
+    if not isinstance(payload, dict) or TRACE_CONTEXT_KEY not in payload:
+        return payload, None
+    payload = dict(payload)
+    return payload, propagate.extract(payload.pop(TRACE_CONTEXT_KEY) or {})
+
+
+def traced_node(name: str, node):
+    """
+    Wrap an async graph node in a span.
+    """
+    async def wrapper(state, config):
+        with tracer.start_as_current_span(f"graph.{name}", attributes={"graph.node": name}):
+            return await node(state, config)
+    wrapper.__name__ = getattr(node, "__name__", name)
+    return wrapper
+
+
+class LLMTracingCallback(BaseCallbackHandler):
+    """
+    One span per chat model call, with time to first token and token usage.
+    """
+
+    run_inline = True
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._spans: Dict[UUID, list] = {}  # run_id -> [span, first token seen]
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any):
+        span = tracer.start_span("llm.chat", kind=SpanKind.CLIENT,
+                                 attributes={"gen_ai.operation.name": "chat", "gen_ai.request.model": self.model_name})
+        self._spans[run_id] = [span, False]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        entry = self._spans.get(run_id)
+        if entry is not None and not entry[1]:
+            entry[1] = True
+            entry[0].add_event("first_token")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        span = entry[0]
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                if usage:
+                    span.set_attribute("gen_ai.usage.input_tokens", usage.get("input_tokens", 0))
+                    span.set_attribute("gen_ai.usage.output_tokens", usage.get("output_tokens", 0))
+        span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        span = entry[0]
+        if type(error).__name__ == "CancelledError":
+            # A hedged attempt that lost the race
+            span.set_attribute("llm.cancelled", True)
+        else:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening a server span per HTTP request, continuing an incoming `traceparent`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        method = scope["method"]
+        with tracer.start_as_current_span(f"{method} {scope['path']}", context=propagate.extract(carrier),
+                                          kind=SpanKind.SERVER,
+                                          attributes={"http.request.method": method, "url.path": scope["path"]}) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    # Name by route template rather than raw path to keep span names low-cardinality
+                    span.update_name(f"{method} {route.path}")
+                    span.set_attribute("http.route", route.path)
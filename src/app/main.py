@@ -1,9 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from psycopg_pool import AsyncConnectionPool
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from app.core.checkpoint_cache import CachedCheckpointSaver
 from app.core.config import settings
+from app.core.llm_scheduler import llm_scheduler
+from app.core.llm_cache import response_cache
+from app.core.principal_cache import principal_cache
+from app.core.metrics import register_checkpoint_pool
+from app.core.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
+from app.core.profiling import ProfilingMiddleware
+from app.core.db_instrumentation import QueryStatsMiddleware
+from app.core.rate_limit import RateLimitMiddleware, rate_limiter
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -14,22 +24,46 @@ logger = setup_daily_logger(logger_name=__name__)
 async def lifespan(app: FastAPI):
     from app.core.config import settings
     from app.services.chatbot_services import build_chat_graph
+    from app.utils.chat_background_utils import transcript_buffer
+    from app.services.greeting_services import greeting_pool
+    from app.services.password_services import password_hasher
+    from app.services.expired_row_services import expired_row_sweeper
+    from app.services.email_transport import email_transport
 
     logger.info("Starting up the application...")
+    setup_tracing(settings.app_name)
     pool = AsyncConnectionPool(conninfo=settings.database_url, kwargs={"autocommit": True}, max_size=20)
     await pool.open()
+    register_checkpoint_pool(pool)
     
     checkpointer = AsyncPostgresSaver(pool)
     await checkpointer.setup()
+    if settings.checkpoint_cache_enabled:
+        checkpointer = CachedCheckpointSaver(checkpointer,
+                                             max_threads=settings.checkpoint_cache_max_threads,
+                                             max_bytes=settings.checkpoint_cache_max_bytes,
+                                             ttl_seconds=settings.checkpoint_cache_ttl_seconds)
     
     graph = build_chat_graph()
     app.state.graph = graph.compile(checkpointer=checkpointer)
     
+    transcript_buffer.start()
+    expired_row_sweeper.start()
+    if greeting_pool is not None:
+        await greeting_pool.start(timeout=settings.greeting_pool_startup_timeout_seconds)
+    
     try:
         yield
     finally:
         logger.info("Shutting down the application...")
+        if greeting_pool is not None:
+            await greeting_pool.stop()
+        await transcript_buffer.stop()
+        await expired_row_sweeper.stop()
+        await email_transport.close()
+        password_hasher.shutdown()
         await pool.close()
+        shutdown_tracing()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -40,6 +74,11 @@ app.include_router(auth_app)
 app.include_router(chatbot_app)
 
 
+if rate_limiter is not None:
+    # Added before CORS so it runs inside it and 429s still carry CORS headers
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter,
+                       trusted_proxies=settings.rate_limit_trusted_proxies)
+
 # CORS
 origins = ["*"]
 app.add_middleware(
@@ -50,6 +89,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Query counts and timings reveal backend details, so they only leave the server outside production
+app.add_middleware(QueryStatsMiddleware,
+                   expose_headers=settings.environment in ("development", "dev", "test"),
+                   detect_n_plus_one=settings.environment in ("development", "dev", "test"),
+                   n_plus_one_threshold=settings.db_n_plus_one_threshold)
+
+if settings.profiling_enabled:
+    if not settings.profiling_admin_token:
+        logger.error("profiling_enabled is set without profiling_admin_token, request profiling stays off")
+    else:
+        app.add_middleware(ProfilingMiddleware,
+                           admin_token=settings.profiling_admin_token,
+                           output_dir=settings.profiling_output_dir,
+                           interval=settings.profiling_interval_seconds,
+                           output_format=settings.profiling_format)
+
+if settings.tracing_enabled:
+    # Outermost, so the request span covers everything including CORS handling
+    app.add_middleware(TracingMiddleware)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok",
+            "llm_admission": llm_scheduler.stats(),
+            "llm_cache": response_cache.stats() if response_cache else None,
+            "principal_cache": principal_cache.stats() if principal_cache else None,
+            "rate_limit": rate_limiter.stats() if rate_limiter else None}
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
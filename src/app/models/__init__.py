@@ -1,7 +1,8 @@
 # Import all models in dependency order to avoid circular imports
 from .base import BaseModel
 from .user import User
-from .auth import OTPVerification
+from .auth import OTPVerification, RefreshToken
 from .chats import ChatSession, ChatTranscript
+from .jobs import Job
 
-__all__ = ["BaseModel", "User", "OTPVerification", "ChatSession", "ChatTranscript"]
\ No newline at end of file
+__all__ = ["BaseModel", "User", "OTPVerification", "RefreshToken", "ChatSession", "ChatTranscript", "Job"]
\ No newline at end of file
@@ -1,19 +1,41 @@
 from .base import BaseModel
 from typing import TYPE_CHECKING
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, DateTime
+from datetime import datetime
+from typing import Optional
 
 if TYPE_CHECKING:
     from .user import User
 
 class OTPVerification(BaseModel):
+    """
+    The live OTP of an email address; at most one per email, replaced in place by create_and_store_otp.
+    """
     
     __tablename__ = "otp_verification"
     __table_args__ = {"schema": "wannabeaiops"}
 
-    email: Mapped[str] = mapped_column(ForeignKey("wannabeaiops.users.email"), index=True, nullable=False)
+    email: Mapped[str] = mapped_column(ForeignKey("wannabeaiops.users.email"), unique=True, index=True, nullable=False)
     otp_code: Mapped[str] = mapped_column(nullable=False)
     request_type: Mapped[str] = mapped_column(nullable=False)  # e.g., 'signup', 'password_reset'
-    expires_at: Mapped[str] = mapped_column(nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
 
-    user: Mapped["User"] = relationship("User", back_populates="otp_verifications")
\ No newline at end of file
+    user: Mapped["User"] = relationship("User", back_populates="otp_verifications")
+
+
+class RefreshToken(BaseModel):
+    """
+    Rotating refresh token. Only the SHA-256 of the token is stored; `family_id` links every token
+    rotated from the same login so a replayed token can revoke the whole chain.
+    """
+    
+    __tablename__ = "refresh_tokens"
+    __table_args__ = {"schema": "wannabeaiops"}
+
+    user_id: Mapped[str] = mapped_column(ForeignKey("wannabeaiops.users.id", ondelete="CASCADE"), index=True, nullable=False)
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)
+    family_id: Mapped[str] = mapped_column(index=True, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
+    revoked_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), index=True, nullable=True)
+    replaced_by: Mapped[Optional[str]] = mapped_column(nullable=True)
@@ -0,0 +1,24 @@
+from .base import BaseModel
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+class Job(BaseModel):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim query filters on status and orders by run_at
+        Index("ix_wannabeaiops_jobs_status_run_at", "status", "run_at"),
+        {"schema": "wannabeaiops"},
+    )
+
+    kind: Mapped[str] = mapped_column(nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False, default="queued")  # 'queued', 'running', 'failed'
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(nullable=True)
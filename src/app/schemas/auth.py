@@ -18,6 +18,8 @@ class LoginRequest(BaseModel):
 class Token(BaseModel):
     token: str
     token_type: str
+    expires_in: Optional[int] = None  # seconds
+    refresh_token: Optional[str] = None
     
 class ForgotPasswordRequest(BaseModel):
     email: str
@@ -27,4 +29,7 @@ class ResendOTPRequest(BaseModel):
 
 class ResetPasswordRequest(BaseModel):
     unique_token: str
-    new_password: str
\ No newline at end of file
+    new_password: str
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
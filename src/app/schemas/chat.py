@@ -7,6 +7,7 @@ class AgentState(TypedDict):
     messages: List
     user_input: Optional[str]
     turns_to_compress: Optional[int]
+    summary: Optional[str]
 
 
 class ChatRequest(BaseModel):
@@ -16,4 +17,14 @@ class ChatRequest(BaseModel):
 
 class ChatSessionRequest(BaseModel):
     page: int
-    page_size: int
\ No newline at end of file
+    page_size: int
+    thread_id: Optional[str] = None  # required by /get_transcripts
+
+
+class BatchChatItem(BaseModel):
+    thread_id: Optional[str] = None  # None starts a new thread
+    user_input: str
+
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem]
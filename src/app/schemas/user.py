@@ -0,0 +1,12 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class CurrentUser(BaseModel):
+    """
+    The authenticated principal handed to endpoints by get_current_user.
+    """
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    id: str
+    email: str
+    username: str
@@ -1,17 +1,22 @@
-from passlib.context import CryptContext
 import secrets
 import string
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta, timezone
 import jwt
-from sqlalchemy.orm import Session
+import hashlib
+from typing import Optional
+from sqlalchemy import select, update, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession as Session
 from app.models.user import User
-from app.schemas.auth import SignUpRequest, VerifyOTPRequest, LoginRequest, Token, ForgotPasswordRequest, ResetPasswordRequest
+from app.schemas.auth import (SignUpRequest, VerifyOTPRequest, LoginRequest, Token, ForgotPasswordRequest, ResetPasswordRequest,
+                              RefreshTokenRequest)
 from app.schemas.common import APIResponse
-from app.utils.auth_utils import (is_password_strong_enough, hash_password, 
-                                  verify_password, create_and_store_otp, create_access_token, decode_token)
-from app.services.email_services import SendEmail
-from app.models.auth import OTPVerification
+from app.utils.auth_utils import (is_password_strong_enough, create_and_store_otp, create_access_token, decode_token)
+from app.services.email_services import SendEmail, dispatch_email
+from app.models.auth import OTPVerification, RefreshToken
+from app.schemas.user import CurrentUser
+from app.core.principal_cache import principal_cache
+from app.services.password_services import password_hasher, PasswordHasherBusy
 
 from app.core.config import settings
 from uuid import uuid4
@@ -20,9 +25,15 @@ from app.core.app_logger import setup_daily_logger
 logger = setup_daily_logger(logger_name=__name__)
 
 
+def _hasher_busy(e: PasswordHasherBusy) -> APIResponse:
+    logger.warning(f"Password hashing unavailable: {e}")
+    return APIResponse(status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                       message="Server is busy, please retry shortly", data=None)
+
+
 async def creat_user_account(data: SignUpRequest, session: Session):
     
-    user_exists = session.query(User).filter(User.email == data.email).first()
+    user_exists = await session.scalar(select(User).where(User.email == data.email))
     
     if user_exists:
         logger.info(f"Attempt to create an account with existing email: {data.email}")
@@ -36,16 +47,21 @@ async def creat_user_account(data: SignUpRequest, session: Session):
                            data = None)
         
     
+    try:
+        hashed_password = await password_hasher.hash(data.password)
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
+    
     user = User()
     user.id = str(uuid4())
     user.username = data.username
     user.email = data.email
-    user.hashed_password = hash_password(data.password)
+    user.hashed_password = hashed_password
     user.is_active = False
     user.created_at = datetime.now(timezone.utc)
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     
     otp = await create_and_store_otp(session, user.email, request_type='signup')
     # convert user into dict
@@ -56,7 +72,7 @@ async def creat_user_account(data: SignUpRequest, session: Session):
     to_encode = {"sub": user.email, "request_type": 'signup'}
     token = create_access_token(data = to_encode, expires_delta= timedelta(minutes=15))
     
-    _ = SendEmail(user.email).send_signup_email(data.username, otp)
+    _ = await dispatch_email(user.email, "send_signup_email", name=data.username, otp=otp)
 
 
     user_dict.update({"unique_token": token})
@@ -76,10 +92,10 @@ async def verify_otp(data: VerifyOTPRequest, session: Session):
     
     email = decoded_token['sub']
     request_type = decoded_token['request_type']
-    user = session.query(User).filter(User.email == email).first()
+    user = await session.scalar(select(User).where(User.email == email))
     if not user:
         logger.info(f"OTP verification attempt for non-existent user: {email}")
-        return APIResponse(status=status.HTTP_404_BAD_REQUEST,
+        return APIResponse(status=status.HTTP_404_NOT_FOUND,
                            message="User not found", data=None)
         
 
@@ -89,9 +105,10 @@ async def verify_otp(data: VerifyOTPRequest, session: Session):
                            message="User already verified", data=None)
 
 
-    otp_record = session.query(OTPVerification).filter(OTPVerification.email == email, OTPVerification.otp_code == data.otp).first()
+    # One lookup on the unique email index; the code is compared here in constant time
+    otp_record = await session.scalar(select(OTPVerification).where(OTPVerification.email == email))
 
-    if not otp_record:
+    if not otp_record or not secrets.compare_digest(otp_record.otp_code.encode(), data.otp.encode()):
         logger.info(f"Invalid OTP attempt for user: {email}")
         return APIResponse(status=status.HTTP_400_BAD_REQUEST,
                            message="Invalid OTP", data=None)
@@ -103,10 +120,7 @@ async def verify_otp(data: VerifyOTPRequest, session: Session):
                            message="OTP purpose mismatch", data=None)
         
     
-    expires_at = datetime.fromisoformat(otp_record.expires_at) if isinstance(otp_record.expires_at, str) else otp_record.expires_at
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
+    if otp_record.expires_at < datetime.now(timezone.utc):
         logger.info(f"Expired OTP attempt for user: {email}")
         return APIResponse(status=status.HTTP_400_BAD_REQUEST,
                            message="OTP has expired", data=None)
@@ -115,8 +129,8 @@ async def verify_otp(data: VerifyOTPRequest, session: Session):
     user.is_active = True
     user.updated_at = datetime.now(timezone.utc)
     session.add(user)
-    session.delete(otp_record)
-    session.commit()
+    await session.delete(otp_record)
+    await session.commit()
        
     return APIResponse(status=status.HTTP_200_OK,
                           message="OTP verified successfully",
@@ -124,7 +138,7 @@ async def verify_otp(data: VerifyOTPRequest, session: Session):
     
 
 async def user_login(data: LoginRequest, session: Session):
-    user = session.query(User).filter(User.email == data.email).first()
+    user = await session.scalar(select(User).where(User.email == data.email))
     
     
     # IS ONBOARDED TRUE OR FALSE 
@@ -140,7 +154,7 @@ async def user_login(data: LoginRequest, session: Session):
         # UNIQUE TOKEN
         token = create_access_token(data = {"sub": user.email, "request_type": "resetpassword"}, 
                                 expires_delta=timedelta(minutes=15))
-        _ = SendEmail(user.email).send_signup_email(user.name, otp)
+        _ = await dispatch_email(user.email, "send_signup_email", name=user.name, otp=otp)
         logger.info(f"Login attempt for unverified user: {data.email}. OTP resent.")
         
         return APIResponse(status= status.HTTP_200_OK,
@@ -148,16 +162,29 @@ async def user_login(data: LoginRequest, session: Session):
                            data={"unique_token": token, "is_active": user.is_active})
         
     
-    if not verify_password(data.password, user.hashed_password):
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(data.password, user.hashed_password)
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
+    
+    if not valid:
         logger.info(f"Incorrect password attempt for user: {data.email}")
         return APIResponse(status= status.HTTP_400_BAD_REQUEST,
                            message = "username or password incorrect", data=None)
     
+    if new_hash:
+        # Stored hash uses an outdated scheme or cost; upgrade it now that we know the password
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
+        logger.info(f"Password hash upgraded for user: {data.email}")
+    
     allowed = ["name", "email", "device_type", "is_onboarded", "is_verified", "profile_picture"]
     user_dict = user.to_dict(allowed_fields= allowed)
 
-    access_token = create_access_token(data={"sub": user.email})
-    user_dict["token_details"] = Token(token=access_token, token_type= 'bearer').model_dump()
+    refresh_token = issue_refresh_token(session, user.id)
+    await session.commit()
+    user_dict["token_details"] = _token_details(user.email, refresh_token)
     
     return APIResponse(status=status.HTTP_202_ACCEPTED,
                        message = "Login successful",
@@ -166,7 +193,7 @@ async def user_login(data: LoginRequest, session: Session):
 
 async def forgot_password(data: ForgotPasswordRequest, session: Session):
     
-    user = session.query(User).filter(User.email == data.email).first()
+    user = await session.scalar(select(User).where(User.email == data.email))
     
     
     if not user:
@@ -178,13 +205,14 @@ async def forgot_password(data: ForgotPasswordRequest, session: Session):
     user.is_active = False
     user.updated_at = datetime.now(timezone.utc)
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
+    _invalidate_principal(user.email)
     otp = await create_and_store_otp(session, user.email, request_type='resetpassword')
     token = create_access_token(data = {"sub": user.email, "request_type": "resetpassword"}, 
                                 expires_delta=timedelta(minutes=15))
     
-    _ = SendEmail(user.email).send_password_reset_email(user.username, otp)
+    _ = await dispatch_email(user.email, "send_password_reset_email", name=user.username, otp=otp)
     
     return APIResponse(status=status.HTTP_202_ACCEPTED, message='Verification OTP sent to registered email',
                        data= {"unique_token": token})
@@ -199,7 +227,7 @@ async def reset_password(data : ResetPasswordRequest, session: Session):
                            message= "Invalid Request Received",
                            data = None)
     
-    user = session.query(User).filter(User.email == email).first()
+    user = await session.scalar(select(User).where(User.email == email))
     
     if not user:
         logger.info(f"Password reset attempt for non-existent user: {email}")
@@ -214,12 +242,18 @@ async def reset_password(data : ResetPasswordRequest, session: Session):
                            data = None)
         
     
-    user.hashed_password = hash_password(data.new_password)
+    try:
+        user.hashed_password = await password_hasher.hash(data.new_password)
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
     user.is_active = True
     user.updated_at = datetime.now(timezone.utc)
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    # A password reset signs out every existing session
+    await _revoke_refresh_tokens(session, RefreshToken.user_id == user.id)
+    await session.commit()
+    await session.refresh(user)
+    _invalidate_principal(user.email)
     
     allowed = ["name", "email", "device_type"]
     user_dict = user.to_dict(allowed_fields= allowed)
@@ -229,10 +263,116 @@ async def reset_password(data : ResetPasswordRequest, session: Session):
 
 
 
+# Refresh tokens: opaque random strings, stored as SHA-256 so a leaked table cannot be replayed
+
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_refresh_token(session: Session, user_id: str, family_id: Optional[str] = None) -> str:
+    """
+    Add a new refresh token row to the session (the caller commits) and return the plain token.
+    """
+    token = secrets.token_urlsafe(32)
+    session.add(RefreshToken(id=str(uuid4()),
+                             user_id=user_id,
+                             token_hash=_hash_refresh_token(token),
+                             family_id=family_id or str(uuid4()),
+                             expires_at=datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days)))
+    return token
+
+
+async def _revoke_refresh_tokens(session: Session, condition):
+    """
+    Revoke every token matching `condition`. They are also expired, so tokens that were just rotated
+    (still accepted during the reuse grace window) stop working too. The caller commits.
+    """
+    now = datetime.now(timezone.utc)
+    await session.execute(update(RefreshToken)
+                          .where(condition, RefreshToken.expires_at > now)
+                          .values(revoked_at=func.coalesce(RefreshToken.revoked_at, now), expires_at=now))
+
+
+def _token_details(email: str, refresh_token: str) -> dict:
+    access_token = create_access_token(data={"sub": email},
+                                       expires_delta=timedelta(minutes=settings.access_token_expire_minutes))
+    return Token(token=access_token, token_type='bearer', expires_in=settings.access_token_expire_minutes * 60,
+                 refresh_token=refresh_token).model_dump()
+
+
+async def refresh_access_token(data: RefreshTokenRequest, session: Session):
+    """
+    Exchange a refresh token for a new access token and a new refresh token (rotation).
+    The happy path is one UPDATE ... RETURNING on the unique token_hash index plus one INSERT; no password hashing.
+    A token rotated less than `refresh_token_reuse_grace_seconds` ago is accepted again (a retried request
+    whose response was lost, or two tabs refreshing at once). Presenting it later revokes the whole family,
+    since it has probably been stolen.
+    """
+    token_hash = _hash_refresh_token(data.refresh_token)
+    now = datetime.now(timezone.utc)
+    new_id = str(uuid4())
+    
+    # Claim the token atomically. Rows are locked, so concurrent refreshes with one token are serialised and
+    # the later ones only pass through the grace window, which counts from the first rotation.
+    rotated = (await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.token_hash == token_hash,
+               or_(RefreshToken.revoked_at.is_(None),
+                   and_(RefreshToken.replaced_by.is_not(None),
+                        RefreshToken.revoked_at > now - timedelta(seconds=settings.refresh_token_reuse_grace_seconds))),
+               RefreshToken.expires_at > now,
+               RefreshToken.user_id == User.id,
+               User.is_active == True)
+        .values(revoked_at=func.coalesce(RefreshToken.revoked_at, now),
+                replaced_by=func.coalesce(RefreshToken.replaced_by, new_id))
+        .returning(RefreshToken.user_id, RefreshToken.family_id, User.email))).first()
+    
+    if rotated is None:
+        existing = await session.scalar(select(RefreshToken).where(RefreshToken.token_hash == token_hash))
+        if existing is not None and existing.revoked_at is not None:
+            logger.warning(f"Reuse of a revoked refresh token for user {existing.user_id}, revoking its family")
+            await _revoke_refresh_tokens(session, RefreshToken.family_id == existing.family_id)
+            await session.commit()
+        else:
+            await session.rollback()
+        return APIResponse(status=status.HTTP_401_UNAUTHORIZED,
+                           message="Invalid or expired refresh token", data=None)
+    
+    user_id, family_id, email = rotated
+    token = secrets.token_urlsafe(32)
+    session.add(RefreshToken(id=new_id,
+                             user_id=user_id,
+                             token_hash=_hash_refresh_token(token),
+                             family_id=family_id,
+                             expires_at=now + timedelta(days=settings.refresh_token_expire_days)))
+    await session.commit()
+    
+    return APIResponse(status=status.HTTP_200_OK, message="Token refreshed",
+                       data={"token_details": _token_details(email, token)})
+
+
+async def logout(data: RefreshTokenRequest, session: Session):
+    """
+    Revoke the refresh token and every token rotated from the same login.
+    Already issued access tokens stay valid until they expire (access_token_expire_minutes).
+    """
+    family_id = select(RefreshToken.family_id).where(RefreshToken.token_hash == _hash_refresh_token(data.refresh_token)) \
+        .scalar_subquery()
+    await _revoke_refresh_tokens(session, RefreshToken.family_id == family_id)
+    await session.commit()
+    return APIResponse(status=status.HTTP_200_OK, message="Logged out", data=None)
+
+
+def _invalidate_principal(email: str):
+    if principal_cache is not None:
+        principal_cache.invalidate(email)
+
+
 # Delete account function
 async def delete_account(user: User, session: Session):
-    session.delete(user)
-    session.commit()
+    await session.delete(user)
+    await session.commit()
+    _invalidate_principal(user.email)
     return APIResponse(status=status.HTTP_204_NO_CONTENT, message="Account deleted successfully", data=None)
 
 
@@ -246,7 +386,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
     """
-    Dependency to validate the JWT and get the current user's email.
+    Dependency to validate the JWT and resolve it to the active user, as a CurrentUser.
+    Resolved principals are cached by token subject, so repeat calls skip the DB lookup.
     """
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
@@ -258,17 +399,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: Session
                 data = None
             )
         
-        user = session.query(User).filter(User.email == user_email, User.is_active==True).first()
+        if principal_cache is not None:
+            cached = principal_cache.get(user_email)
+            if cached is not None:
+                return cached
+            generation = principal_cache.generation()
+        
+        user = await session.scalar(select(User).where(User.email == user_email, User.is_active==True))
         if user is None:
             return  APIResponse(
                 status=status.HTTP_401_UNAUTHORIZED,
                 message = "Un-identified user",
                 data = None
             )
+        
+        principal = CurrentUser.model_validate(user)
+        if principal_cache is not None:
+            principal_cache.set(user_email, principal, generation)
     except jwt.PyJWTError:
         return  APIResponse(
                 status=status.HTTP_401_UNAUTHORIZED,
                 message = "Invalid or Expired token",
                 data = None
             )
-    return user
\ No newline at end of file
+    return principal
\ No newline at end of file
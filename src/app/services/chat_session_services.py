@@ -1,20 +1,21 @@
 from app.models.chats import ChatSession, ChatTranscript
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select
 from app.core.database import get_session
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession as Session
 
 from app.core.app_logger import setup_daily_logger
 import traceback
 logger = setup_daily_logger(logger_name=__name__)
 
-def get_sessions_be_user(session: Session, user_id: int, page: int = 1, page_size: int = 10):
+async def get_sessions_be_user(session: Session, user_id: int, page: int = 1, page_size: int = 10):
     try:
         if page < 1:
             page = 1
         offset = (page - 1) * page_size
         
-        entries = session.query(ChatSession).filter(ChatSession.user_id == user_id).order_by(ChatSession.created_at.desc())\
-            .offset(offset).limit(page_size).all()
+        entries = (await session.scalars(select(ChatSession).where(ChatSession.user_id == user_id).order_by(ChatSession.created_at.desc())\
+            .offset(offset).limit(page_size))).all()
         
         allowed_columns = ["thread_id", "created_at"]
         list_content = [entry.to_dict(allowed_columns) for entry in entries]
@@ -22,7 +23,7 @@ def get_sessions_be_user(session: Session, user_id: int, page: int = 1, page_siz
         return list_content
 
     except SQLAlchemyError as e:
-        session.rollback()
+        await session.rollback()
         logger.error(f"Error in get_sessions_by_user: {e}")
         logger.error(traceback.format_exc())
         return []
@@ -31,22 +32,21 @@ def get_sessions_be_user(session: Session, user_id: int, page: int = 1, page_siz
         logger.error(traceback.format_exc())
         return []
 
-def get_transcripts_by_thread(session: Session, thread_id: str,page: int = 1, page_size: int = 10):
+async def get_transcripts_by_thread(session: Session, thread_id: str,page: int = 1, page_size: int = 10):
     try:
         if page < 1:
             page = 1
         
         offset = (page - 1) * page_size
-        entries = session.query(ChatTranscript).filter(ChatTranscript.thread_id == thread_id)\
+        entries = (await session.scalars(select(ChatTranscript).where(ChatTranscript.thread_id == thread_id)\
             .order_by(ChatTranscript.created_at.asc())\
             .offset(offset)\
-                    .limit(page_size)\
-                    .all()
+                    .limit(page_size))).all()
         allowed_columns = ["message", "sender", "created_at"]
         list_content = [entry.to_dict(allowed_columns) for entry in entries]
         return list_content
     except SQLAlchemyError as e:
-        session.rollback()
+        await session.rollback()
         logger.error(f"Error in get_transcripts_by_thread: {e}")
         logger.error(traceback.format_exc())
         return []
@@ -55,23 +55,25 @@ def get_transcripts_by_thread(session: Session, thread_id: str,page: int = 1, pa
         logger.error(traceback.format_exc())
         return []
 
-# delete a session and transcripts by thread_id
-def delete_session_by_thread(session: Session, thread_id: str):
+# delete a session and transcripts by thread_id, only when the session belongs to user_id.
+# Returns the id of the deleted session, or None
+async def delete_session_by_thread(session: Session, thread_id: str, user_id: str):
     try:
-        chat_session = session.query(ChatSession).filter(ChatSession.thread_id == thread_id).first()
+        chat_session = await session.scalar(select(ChatSession).where(ChatSession.thread_id == thread_id,
+                                                                      ChatSession.user_id == user_id))
         if chat_session:
-            session.delete(chat_session)
-            session.commit()
-            return True
+            await session.delete(chat_session)
+            await session.commit()
+            return chat_session.id
         else:
             logger.info(f"No chat session found with thread_id: {thread_id}")
-            return False
+            return None
     except SQLAlchemyError as e:
-        session.rollback()
+        await session.rollback()
         logger.error(f"Error in delete_session_by_thread: {e}")
         logger.error(traceback.format_exc())
-        return False
+        return None
     except Exception as e:
         logger.error(f"Unexpected error in delete_session_by_thread: {e}")
         logger.error(traceback.format_exc())
-        return False
\ No newline at end of file
+        return None
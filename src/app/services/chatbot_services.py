@@ -1,51 +1,165 @@
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 from app.schemas.chat import AgentState
 
 from app.core.app_logger import setup_daily_logger
 import traceback
+from typing import Optional
 logger = setup_daily_logger("auth_services")
 from app.core.config import settings, get_model
+from app.utils.token_utils import estimate_tokens, estimate_message_tokens
+from app.core.llm_scheduler import llm_scheduler
+from app.core.llm_cache import response_cache
+from app.core.metrics import timed_node, BACKGROUND_FAILURES
+from app.core.tracing import tracer, traced_node
 
 
 model = get_model()
 
-async def call_model(state: AgentState) -> AgentState:
+def _user_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    return (config or {}).get("configurable", {}).get("user_id")
+
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+GREETING_PROMPT = "Generate initial greeting."
+# Greetings are tagged so the response cache can tell them apart from real conversation context
+GREETING_NAME = "greeting"
+
+
+async def call_model(state: AgentState, config: RunnableConfig) -> AgentState:
+    
+    context = [SystemMessage(content=f"Summary of the earlier conversation: {state['summary']}")] if state.get("summary") else []
+    messages = [SystemMessage(content=SYSTEM_PROMPT)] + context + state["messages"] + [HumanMessage(content=state["user_input"] if state.get("user_input") else GREETING_PROMPT)]
     
-    messages = [SystemMessage(content="You are a helpful assistant.")] + state["messages"] + [HumanMessage(content=state["user_input"] if state.get("user_input") else "Generate initial greeting.")]
+    cache_key = None
+    if response_cache is not None:
+        history = [message for message in state["messages"] if message.name != GREETING_NAME]
+        if response_cache.is_cacheable(state.get("summary"), history, state.get("user_input")):
+            cache_key = response_cache.make_key(SYSTEM_PROMPT, state.get("summary"), history, state["user_input"])
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                state["turns_to_compress"] = (state.get("turns_to_compress") or 0) + 1
+                state["messages"].append(AIMessage(content=cached))
+                return state
     
-    response = await model.ainvoke(messages)
-    state["turns_to_compress"] += 1
-    state["messages"].append(AIMessage(content=response.content))
+    # Stream from the model so graph.astream(stream_mode="messages") can forward
+    # tokens as they arrive; the aggregated chunk is stored exactly as before.
+    response = None
+    async with llm_scheduler.admit(_user_id(config)):
+        async for chunk in model.astream(messages):
+            response = chunk if response is None else response + chunk
+    if response is None:
+        # Some providers end the stream without a chunk (e.g. a filtered reply); store an empty answer
+        logger.warning("Model stream returned no chunks, storing an empty reply")
+        response = AIMessage(content="")
+    
+    if cache_key is not None and isinstance(response.content, str) and response.content:
+        await response_cache.set(cache_key, response.content)
+    
+    state["turns_to_compress"] = (state.get("turns_to_compress") or 0) + 1
+    state["messages"].append(AIMessage(content=response.content, name=None if state.get("user_input") else GREETING_NAME))
     
     return state
 
 
-async def should_compress(state: AgentState) -> AgentState:
-    if not state.get("journal_complete"):
-        if state.get("turns_to_compress") >= 3:
-            SUMMARY_PROMPT = """Summarize the following messages into a concise context that captures the key points of the conversation so far.
-            The summary should be brief but informative, allowing the assistant to understand the context without needing to review all previous messages.
-            maximum 100 words.
-            Messages:"""
-            logger.debug(f"Executing Context Compression @ turns{state.get('turns_to_compression')}")
-            messages_to_compress = state.get("messages")
-            messages_to_compress = "\n".join([f"{i.type}:{i.content}" for i in messages_to_compress])
-            context_summary = await model.ainvoke([SystemMessage(content= SUMMARY_PROMPT), 
-                                            HumanMessage(content= messages_to_compress)])
-            state["messages"] = [context_summary]
-            state["turns_to_compress"] = 0
-            logger.info("Compression complete")
-            return state
+SUMMARY_PROMPT = """Update the running summary of a conversation with the new messages below.
+            Keep every key point from the existing summary and add what the new messages contribute.
+            The summary should be brief but informative, allowing the assistant to understand the context without needing to review the folded messages.
+            maximum 150 words."""
+
+
+def context_tokens(state: AgentState) -> int:
+    return (estimate_tokens(state.get("summary")) + estimate_message_tokens(state.get("messages") or [])
+            + estimate_tokens(state.get("user_input")))
+
+
+def needs_compression(state: AgentState) -> bool:
+    if state.get("journal_complete"):
+        return False
+    return (len(state.get("messages") or []) > settings.context_keep_recent_messages
+            and context_tokens(state) > settings.context_token_budget)
+
+
+def split_for_compression(state: AgentState):
+    """
+    (older, recent): the messages to fold into the summary and the recent ones kept verbatim.
+    """
+    messages = state.get("messages") or []
+    keep = settings.context_keep_recent_messages
+    return messages[:len(messages) - keep], messages[len(messages) - keep:]
+
+
+async def summarize_messages(messages, summary=None, user_id: Optional[str] = None) -> str:
+    """
+    Fold `messages` into the existing `summary`. Only the new messages are sent in full;
+    text that was already summarised is only carried as the previous summary.
+    """
+    new_messages = "\n".join([f"{i.type}:{i.content}" for i in messages])
+    content = f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{new_messages}"
+    async with llm_scheduler.admit(user_id):
+        response = await model.ainvoke([SystemMessage(content= SUMMARY_PROMPT), 
+                                        HumanMessage(content= content)])
+    return response.content
+
+
+async def should_compress(state: AgentState, config: RunnableConfig) -> AgentState:
+    if needs_compression(state):
+        older, recent = split_for_compression(state)
+        logger.debug(f"Executing Context Compression @ ~{context_tokens(state)} tokens, folding {len(older)} messages")
+        state["summary"] = await summarize_messages(older, state.get("summary"), _user_id(config))
+        state["messages"] = recent
+        state["turns_to_compress"] = 0
+        logger.info("Compression complete")
+        return state
     return state
 
 
+async def compress_thread_state(graph, thread_id, user_id: Optional[str] = None):
+    """
+    Deferred compression: fold a thread's older messages into its summary after the response has been
+    returned and write the compacted state back to its checkpoint, so the next turn starts from it.
+    Skipped when a new turn has checkpointed the thread meanwhile; the next turn schedules it again.
+    """
+    try:
+        with tracer.start_as_current_span("deferred_compression", attributes={"thread_id": str(thread_id)}):
+            config = {"configurable": {"thread_id": str(thread_id)}}
+            snapshot = await graph.aget_state(config)
+            state = snapshot.values
+            if not state or not needs_compression(state):
+                return
+            checkpoint_id = snapshot.config["configurable"]["checkpoint_id"]
+            
+            older, recent = split_for_compression(state)
+            summary = await summarize_messages(older, state.get("summary"), user_id)
+            
+            latest = await graph.aget_state(config)
+            if latest.config["configurable"]["checkpoint_id"] != checkpoint_id:
+                logger.info(f"Thread {thread_id} changed during deferred compression, skipping")
+                return
+            
+            # Written on top of the checkpoint that was summarised, never on one it has not seen
+            await graph.aupdate_state(snapshot.config,
+                                      {"summary": summary, "messages": recent, "turns_to_compress": 0},
+                                      as_node="call_model")
+            logger.info(f"Deferred compression complete for thread {thread_id}")
+    
+    except Exception as e:
+        BACKGROUND_FAILURES.labels("deferred_compression").inc()
+        logger.error(f"Deferred compression failed for thread {thread_id}: {e}")
+        logger.error(traceback.format_exc())
+
+
 def build_chat_graph():
     builder = StateGraph(AgentState)
-    builder.add_node("call_model", call_model)
-    builder.add_node("should_compress", should_compress)
-    builder.add_edge("should_compress", "call_model")
-    builder.set_entry_point("should_compress")
+    builder.add_node("call_model", timed_node("call_model", traced_node("call_model", call_model)))
+    if settings.compression_mode == "deferred":
+        # Compression runs after the response via compress_thread_state
+        builder.set_entry_point("call_model")
+    else:
+        builder.add_node("should_compress", timed_node("should_compress", traced_node("should_compress", should_compress)))
+        builder.add_edge("should_compress", "call_model")
+        builder.set_entry_point("should_compress")
     builder.add_edge("call_model", END)
     return builder
 
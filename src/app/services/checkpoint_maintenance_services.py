@@ -0,0 +1,144 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from psycopg import AsyncConnection
+
+from app.core.config import settings
+from app.services.job_queue_services import register_job_handler
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+# (thread, namespace) pairs with more than `keep` checkpoints, paged on the pair so a thread whose
+# namespaces straddle a page boundary is picked up where the previous page stopped
+_THREADS_TO_PRUNE = """
+SELECT thread_id, checkpoint_ns FROM checkpoints
+WHERE (thread_id, checkpoint_ns) > (%(after_thread)s, %(after_ns)s)
+GROUP BY thread_id, checkpoint_ns
+HAVING count(*) > %(keep)s
+ORDER BY thread_id, checkpoint_ns
+LIMIT %(batch)s
+"""
+
+# The pairs of the current batch, passed as two parallel arrays
+_IN_BATCH = "IN (SELECT * FROM unnest(%(threads)s::text[], %(namespaces)s::text[]))"
+
+# Checkpoint ids are time-ordered, so the newest `keep` per (thread, namespace) survive
+_DELETE_CHECKPOINTS = """
+WITH ranked AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id,
+           row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn
+    FROM checkpoints
+    WHERE (thread_id, checkpoint_ns) """ + _IN_BATCH + """
+), deleted AS (
+    DELETE FROM checkpoints c
+    USING ranked r
+    WHERE c.thread_id = r.thread_id AND c.checkpoint_ns = r.checkpoint_ns
+      AND c.checkpoint_id = r.checkpoint_id AND r.rn > %(keep)s
+    RETURNING pg_column_size(c.*) AS size
+)
+SELECT count(*), coalesce(sum(size), 0) FROM deleted
+"""
+
+# Pending writes of checkpoints that no longer exist. Only ids older than the oldest surviving
+# checkpoint are touched, so writes of a checkpoint being saved concurrently are never removed.
+_DELETE_ORPHAN_WRITES = """
+WITH deleted AS (
+    DELETE FROM checkpoint_writes w
+    WHERE (w.thread_id, w.checkpoint_ns) """ + _IN_BATCH + """
+      AND w.checkpoint_id < (SELECT min(c.checkpoint_id) FROM checkpoints c
+                             WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns)
+    RETURNING pg_column_size(w.*) AS size
+)
+SELECT count(*), coalesce(sum(size), 0) FROM deleted
+"""
+
+# Channel blobs no surviving checkpoint references. Versions newer than the newest referenced one
+# may belong to a checkpoint that is being written right now and are kept.
+_DELETE_ORPHAN_BLOBS = """
+WITH deleted AS (
+    DELETE FROM checkpoint_blobs b
+    WHERE (b.thread_id, b.checkpoint_ns) """ + _IN_BATCH + """
+      AND NOT EXISTS (SELECT 1 FROM checkpoints c
+                      WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+                        AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version)
+      AND b.version < (SELECT max(c.checkpoint -> 'channel_versions' ->> b.channel) FROM checkpoints c
+                       WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns)
+    RETURNING pg_column_size(b.*) AS size
+)
+SELECT count(*), coalesce(sum(size), 0) FROM deleted
+"""
+
+
+def _empty_report() -> Dict:
+    return {"threads": 0,
+            "checkpoints": {"rows": 0, "bytes": 0},
+            "checkpoint_writes": {"rows": 0, "bytes": 0},
+            "checkpoint_blobs": {"rows": 0, "bytes": 0}}
+
+
+async def _delete(conn: AsyncConnection, query: str, params: Dict, report: Dict, table: str):
+    cursor = await conn.execute(query, params)
+    rows, size = await cursor.fetchone()
+    report[table]["rows"] += rows
+    report[table]["bytes"] += int(size)
+
+
+async def compact_checkpoints(conn: AsyncConnection, keep_last: int, batch_size: int,
+                              pause_seconds: float = 0.0, max_batches: Optional[int] = None) -> Dict:
+    """
+    Keep only the latest `keep_last` checkpoints per thread and namespace and delete the writes and blobs
+    that become orphaned. (thread, namespace) pairs are processed `batch_size` at a time, each batch in its own short transaction that
+    only takes row locks, so it can run next to live traffic. Returns rows and bytes reclaimed per table.
+    """
+    if keep_last < 1:
+        raise ValueError("keep_last must be at least 1")
+
+    report = _empty_report()
+    started = time.monotonic()
+    after, batches = ("", ""), 0
+
+    while max_batches is None or batches < max_batches:
+        cursor = await conn.execute(_THREADS_TO_PRUNE, {"after_thread": after[0], "after_ns": after[1],
+                                                        "keep": keep_last, "batch": batch_size})
+        pairs: List[Tuple[str, str]] = [tuple(row) for row in await cursor.fetchall()]
+        if not pairs:
+            break
+
+        params = {"threads": [thread for thread, _ in pairs], "namespaces": [ns for _, ns in pairs], "keep": keep_last}
+        async with conn.transaction():
+            await _delete(conn, _DELETE_CHECKPOINTS, params, report, "checkpoints")
+            await _delete(conn, _DELETE_ORPHAN_WRITES, params, report, "checkpoint_writes")
+            await _delete(conn, _DELETE_ORPHAN_BLOBS, params, report, "checkpoint_blobs")
+
+        # A thread continued from the previous batch was already counted
+        report["threads"] += len({thread for thread, _ in pairs} - {after[0]})
+        after, batches = pairs[-1], batches + 1
+        logger.debug(f"Compacted checkpoint batch {batches} ({len(pairs)} thread namespaces, up to {after})")
+
+        if pause_seconds:
+            await asyncio.sleep(pause_seconds)
+
+    report["rows_reclaimed"] = sum(report[table]["rows"] for table in ("checkpoints", "checkpoint_writes", "checkpoint_blobs"))
+    report["bytes_reclaimed"] = sum(report[table]["bytes"] for table in ("checkpoints", "checkpoint_writes", "checkpoint_blobs"))
+    report["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    logger.info(f"Checkpoint compaction finished: {report['threads']} threads, "
+                f"{report['rows_reclaimed']} rows, {report['bytes_reclaimed']} bytes reclaimed")
+    return report
+
+
+async def run_checkpoint_compaction(keep_last: Optional[int] = None, batch_size: Optional[int] = None,
+                                    pause_seconds: float = 0.0, max_batches: Optional[int] = None) -> Dict:
+    async with await AsyncConnection.connect(settings.database_url, autocommit=True) as conn:
+        return await compact_checkpoints(conn,
+                                         keep_last=keep_last or settings.checkpoint_keep_last,
+                                         batch_size=batch_size or settings.checkpoint_compaction_batch_size,
+                                         pause_seconds=pause_seconds,
+                                         max_batches=max_batches)
+
+
+@register_job_handler("compact_checkpoints")
+async def compact_checkpoints_job(session, payload: Dict):
+    await run_checkpoint_compaction(**payload)
@@ -1,13 +1,17 @@
 from app.utils.email_templates import *
 import jwt
 import os
-import smtplib
-import ssl
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import time
+from email.message import EmailMessage
 from hashlib import sha256
 
 from app.core.config import settings
+from app.core.metrics import SMTP_SEND_SECONDS
+from app.core.tracing import tracer
+from app.services.email_transport import email_transport
+from app.services.job_queue_services import register_job_handler, submit_job
+from app.models.auth import OTPVerification
+from sqlalchemy import select, func
 
 
 from app.core.app_logger import setup_daily_logger
@@ -20,61 +24,76 @@ class SendEmail:
     def __init__(self, _to):
         self._to = _to
     
-    def send_signup_email(self, name: str, otp: str):
+    async def send_signup_email(self, name: str, otp: str):
         subject, body = generate_signup_email(name, otp)
-        return self._send_email(subject, body)
+        return await self._send_email(subject, body)
     
-    def send_password_reset_email(self, name: str, otp: str):
+    async def send_password_reset_email(self, name: str, otp: str):
         subject, body = generate_password_reset_email(name, otp)
-        return self._send_email(subject, body)
+        return await self._send_email(subject, body)
     
-    def resend_otp_email(self, name: str, otp: str):
+    async def resend_otp_email(self, name: str, otp: str):
         subject, body = generate_resend_otp_email(name, otp)
-        return self._send_email(subject, body)
+        return await self._send_email(subject, body)
     
-    def send_custom_email(self, subject: str, body: str):
-        return self._send_email(subject, body)
+    async def send_custom_email(self, subject: str, body: str):
+        return await self._send_email(subject, body)
     
     
     
-    def _send_email(self, subject: str, body: str):
+    async def _send_email(self, subject: str, body: str):
+        started = time.perf_counter()
+        with tracer.start_as_current_span("email.send", attributes={"email.subject": subject}) as span:
+            sent = await self._deliver(subject, body)
+            span.set_attribute("email.sent", sent)
+        SMTP_SEND_SECONDS.labels("sent" if sent else "failed").observe(time.perf_counter() - started)
+        return sent
+    
+    async def _deliver(self, subject: str, body: str):
         try:
-            # Gmail SMTP configuration
-            smtp_host = "smtp.gmail.com"
-            smtp_port = 587  # Use 587 for TLS, or 465 for SSL
-            
-            # Use app password from settings
-            app_password = str(settings.app_password)
-            
-            message = MIMEMultipart()
+            message = EmailMessage()
             message['From'] = settings.email_from
             message['To'] = self._to
             message['Subject'] = subject
-            message.attach(MIMEText(body, 'html'))
+            message.set_content(body, subtype='html')
             
-            # Create SMTP session
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                logger.info("Starting TLS encryption...")
-                server.starttls()  # Enable TLS encryption
-                
-                logger.info("Logging into Gmail server...")
-                server.login(settings.email_from, app_password)
-
-                logger.info("Sending the email...")
-                server.sendmail(
-                    settings.email_from, self._to, message.as_string()
-                )
-                logger.info("✅ Email sent successfully via Gmail!")
-                return True
+            await email_transport.send(message)
+            logger.info(f"Email '{subject}' sent to {self._to}")
+            return True
                 
-        except smtplib.SMTPAuthenticationError:
-            logger.error("❌ Gmail authentication failed. Check your email and app password.")
-        except smtplib.SMTPRecipientsRefused:
-            logger.error(f"❌ Recipient {self._to} was refused by Gmail server.")
-        except smtplib.SMTPSenderRefused:
-            logger.error(f"❌ Sender {settings.email_from} was refused by Gmail server.")
         except Exception as e:
-            logger.error(f"❌ An error occurred while sending email: {e}")
+            logger.error(f"❌ An error occurred while sending email to {self._to}: {e}")
             logger.debug(traceback.format_exc())
         
-        return False
\ No newline at end of file
+        return False
+
+
+async def dispatch_email(_to: str, template: str, **kwargs):
+    """
+    Send one of the SendEmail templates, e.g. dispatch_email(to, "send_signup_email", name=..., otp=...).
+    With the job queue enabled the send is handed to the worker instead of running in the API process.
+    The OTP is not written to the jobs table; the worker reads the recipient's live OTP when it sends.
+    """
+    if settings.job_queue_enabled:
+        payload = {"to": _to, "template": template,
+                   "kwargs": {key: value for key, value in kwargs.items() if key != "otp"},
+                   "load_otp": "otp" in kwargs}
+        return await submit_job("send_email", payload)
+    return await getattr(SendEmail(_to), template)(**kwargs)
+
+
+@register_job_handler("send_email")
+async def send_email_job(session, payload):
+    kwargs = dict(payload["kwargs"])
+    if payload.get("load_otp"):
+        otp = await session.scalar(select(OTPVerification.otp_code)
+                                   .where(OTPVerification.email == payload["to"], OTPVerification.expires_at > func.now()))
+        if otp is None:
+            # Verified, expired or swept meanwhile: nothing worth sending any more
+            logger.info(f"No live OTP for {payload['to']}, {payload['template']} not sent")
+            return
+        kwargs["otp"] = otp
+    sent = await getattr(SendEmail(payload["to"]), payload["template"])(**kwargs)
+    if not sent:
+        # Raise so the job is retried with backoff
+        raise RuntimeError(f"Email {payload['template']} to {payload['to']} was not sent")
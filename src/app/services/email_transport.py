@@ -0,0 +1,166 @@
+import asyncio
+import mailbox
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import Deque, List, Optional
+
+from app.core.config import settings
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+class _PooledConnection:
+    __slots__ = ("client", "last_used")
+
+    def __init__(self):
+        self.client = None
+        self.last_used = 0.0
+
+
+class SMTPTransport:
+    """
+    Sends through a pool of `pool_size` persistent, authenticated SMTP connections, opened on first use.
+    A connection idle for `noop_after_idle` seconds is checked with NOOP before reuse; a dead one is
+    reopened, and a send that fails because the server dropped the connection is retried once on a new one.
+    Port 465 uses implicit TLS, other ports STARTTLS when the server offers it.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str],
+                 pool_size: int, timeout: float, noop_after_idle: float):
+        try:
+            import aiosmtplib
+        except ImportError as e:
+            raise RuntimeError("email_backend='smtp' requires the 'aiosmtplib' package") from e
+        self._aiosmtplib = aiosmtplib
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.noop_after_idle = noop_after_idle
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[_PooledConnection] = []
+
+    def _pool(self) -> asyncio.Queue:
+        # Created on first use so it belongs to the running loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            self._connections = [_PooledConnection() for _ in range(max(1, self.pool_size))]
+            for connection in self._connections:
+                self._idle.put_nowait(connection)
+        return self._idle
+
+    async def _connect(self, connection: _PooledConnection):
+        await self._disconnect(connection)
+        client = self._aiosmtplib.SMTP(hostname=self.host, port=self.port, timeout=self.timeout,
+                                       use_tls=self.port == 465)
+        await client.connect()
+        if self.username and self.password and client.supports_extension("auth"):
+            await client.login(self.username, self.password)
+        connection.client = client
+        logger.info(f"Opened SMTP connection to {self.host}:{self.port}")
+
+    async def _disconnect(self, connection: _PooledConnection):
+        client, connection.client = connection.client, None
+        if client is not None and client.is_connected:
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+
+    async def _ready(self, connection: _PooledConnection):
+        if connection.client is None or not connection.client.is_connected:
+            await self._connect(connection)
+        elif time.monotonic() - connection.last_used > self.noop_after_idle:
+            try:
+                await connection.client.noop()
+            except self._aiosmtplib.SMTPException:
+                logger.info("Idle SMTP connection failed its NOOP check, reconnecting")
+                await self._connect(connection)
+
+    async def send(self, message: EmailMessage):
+        pool = self._pool()
+        connection = await pool.get()
+        try:
+            await self._ready(connection)
+            try:
+                await connection.client.send_message(message)
+            except (self._aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                logger.info("SMTP connection dropped during send, retrying on a new connection")
+                await self._connect(connection)
+                await connection.client.send_message(message)
+            connection.last_used = time.monotonic()
+        except BaseException:
+            # A failed or cancelled send can leave the session mid-transaction; start the next one afresh
+            if connection.client is not None:
+                connection.client.close()
+                connection.client = None
+            raise
+        finally:
+            pool.put_nowait(connection)
+
+    async def close(self):
+        for connection in self._connections:
+            await self._disconnect(connection)
+
+
+class FileTransport:
+    """
+    Appends every message to a local mbox file, for development and for load tests without a mail server.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    def _append(self, message: EmailMessage):
+        box = mailbox.mbox(self.path)
+        box.lock()
+        try:
+            box.add(message)
+            box.flush()
+        finally:
+            box.unlock()
+            box.close()
+
+    async def send(self, message: EmailMessage):
+        async with self._lock:
+            await asyncio.to_thread(self._append, message)
+
+    async def close(self):
+        pass
+
+
+class MemoryTransport:
+    """
+    Keeps the last `max_messages` messages in `outbox`, for tests and benchmarks.
+    """
+
+    def __init__(self, max_messages: int = 1000):
+        self.outbox: Deque[EmailMessage] = deque(maxlen=max_messages)
+
+    async def send(self, message: EmailMessage):
+        self.outbox.append(message)
+
+    async def close(self):
+        pass
+
+
+def build_email_transport():
+    if settings.email_backend == "file":
+        return FileTransport(settings.email_file_path)
+    if settings.email_backend == "memory":
+        return MemoryTransport()
+    return SMTPTransport(host=settings.email_host,
+                         port=settings.email_port,
+                         username=settings.email_from,
+                         password=settings.app_password,
+                         pool_size=settings.email_pool_size,
+                         timeout=settings.email_timeout_seconds,
+                         noop_after_idle=settings.email_noop_after_idle_seconds)
+
+
+email_transport = build_email_transport()
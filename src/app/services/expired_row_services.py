@@ -0,0 +1,103 @@
+import asyncio
+import traceback
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import BACKGROUND_FAILURES
+from app.core.tracing import tracer
+from app.models.auth import OTPVerification, RefreshToken
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+async def _delete_in_batches(model, condition, batch_size: int) -> int:
+    """
+    Delete the rows of `model` matching `condition` in batches of `batch_size`, each in its own short transaction,
+    and return how many were removed. Rows locked by another sweeper (another worker) are skipped, not waited on.
+    """
+    stale = select(model.id) \
+        .where(condition) \
+        .limit(batch_size) \
+        .with_for_update(skip_locked=True) \
+        .scalar_subquery()
+    deleted = 0
+    async with SessionLocal() as session:
+        while True:
+            result = await session.execute(delete(model).where(model.id.in_(stale)))
+            await session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+            await asyncio.sleep(0)
+
+
+async def delete_expired_otps(batch_size: int) -> int:
+    return await _delete_in_batches(OTPVerification, OTPVerification.expires_at < func.now(), batch_size)
+
+
+async def delete_stale_refresh_tokens(batch_size: int) -> int:
+    """
+    Expired refresh tokens, and revoked ones older than `refresh_token_revoked_retention_hours`.
+    Revoked tokens are kept that long so presenting one still revokes its family.
+    """
+    retention = timedelta(hours=settings.refresh_token_revoked_retention_hours)
+    return await _delete_in_batches(RefreshToken,
+                                    or_(RefreshToken.expires_at < func.now(),
+                                        RefreshToken.revoked_at < func.now() - retention),
+                                    batch_size)
+
+
+class ExpiredRowSweeper:
+    """
+    Background task of the API process deleting expired OTPs and stale refresh tokens every `interval` seconds.
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sweep_one(self, kind: str, delete_rows) -> int:
+        with tracer.start_as_current_span(f"{kind}.sweep"):
+            try:
+                deleted = await delete_rows(self.batch_size)
+            except SQLAlchemyError as e:
+                BACKGROUND_FAILURES.labels(f"{kind}_sweep").inc()
+                logger.warning(f"Deleting stale {kind} rows failed: {e}")
+                logger.error(traceback.format_exc())
+                return 0
+        if deleted:
+            logger.info(f"Deleted {deleted} stale {kind} rows")
+        return deleted
+
+    async def sweep(self) -> int:
+        return await self._sweep_one("otp", delete_expired_otps) \
+            + await self._sweep_one("refresh_token", delete_stale_refresh_tokens)
+
+    async def _run(self):
+        while True:
+            await self.sweep()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+expired_row_sweeper = ExpiredRowSweeper(interval=settings.expired_row_sweep_interval_seconds,
+                                        batch_size=settings.expired_row_sweep_batch_size)
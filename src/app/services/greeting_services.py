@@ -0,0 +1,110 @@
+import asyncio
+import traceback
+from collections import deque
+from typing import Deque, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.core.config import settings
+from app.core.llm_scheduler import llm_scheduler
+from app.core.metrics import BACKGROUND_FAILURES
+from app.services.chatbot_services import model, SYSTEM_PROMPT, GREETING_PROMPT, GREETING_NAME
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+# Admission queue key for pool generation, so refills take their fair share like any user
+GREETING_POOL_USER = "__greeting_pool__"
+
+
+class GreetingPool:
+    """
+    Pre-generated opening messages for new chat sessions, served in rotation.
+    Each greeting is retired after `max_uses` serves and a replacement is generated in the background,
+    so the pool keeps some variety without a model call on the request path.
+    """
+
+    def __init__(self, size: int, max_uses: int):
+        self.size = size
+        self.max_uses = max_uses
+        self._greetings: Deque[List] = deque()  # [text, uses]
+        self._refill_task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._greetings)
+
+    async def _generate(self) -> Optional[str]:
+        try:
+            async with llm_scheduler.admit(GREETING_POOL_USER):
+                response = await model.ainvoke([SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=GREETING_PROMPT)])
+            return response.content if isinstance(response.content, str) and response.content else None
+        except Exception as e:
+            BACKGROUND_FAILURES.labels("greeting_generation").inc()
+            logger.warning(f"Greeting generation failed: {e}")
+            logger.debug(traceback.format_exc())
+            return None
+
+    async def fill(self):
+        missing = self.size - len(self._greetings)
+        if missing <= 0:
+            return
+        greetings = await asyncio.gather(*(self._generate() for _ in range(missing)))
+        for greeting in greetings:
+            if greeting is not None and len(self._greetings) < self.size:
+                self._greetings.append([greeting, 0])
+        logger.info(f"Greeting pool holds {len(self._greetings)}/{self.size} greetings")
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self.fill())
+
+    def next(self) -> Optional[str]:
+        if not self._greetings:
+            self._schedule_refill()
+            return None
+
+        entry = self._greetings.popleft()
+        entry[1] += 1
+        if entry[1] < self.max_uses:
+            self._greetings.append(entry)
+        else:
+            self._schedule_refill()
+        return entry[0]
+
+    async def start(self, timeout: float):
+        try:
+            await asyncio.wait_for(self.fill(), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Startup must not hang on the model; serving falls back to generating greetings
+            logger.warning("Greeting pool was not filled before the startup timeout, refilling in the background")
+            self._schedule_refill()
+
+    async def stop(self):
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+
+
+async def seed_greeting(graph, thread_id) -> Optional[str]:
+    """
+    Start a new thread with a pooled greeting written straight into its checkpoint as the first AIMessage.
+    Returns None when the pool is empty, in which case the caller runs the graph as usual.
+    """
+    greeting = greeting_pool.next() if greeting_pool is not None else None
+    if greeting is None:
+        return None
+
+    await graph.aupdate_state({"configurable": {"thread_id": str(thread_id)}},
+                              {"messages": [AIMessage(content=greeting, name=GREETING_NAME)],
+                               "user_input": None,
+                               "turns_to_compress": 1,
+                               "summary": None},
+                              as_node="call_model")
+    return greeting
+
+
+greeting_pool = GreetingPool(size=settings.greeting_pool_size, max_uses=settings.greeting_max_uses) \
+    if settings.greeting_pool_size > 0 else None
@@ -0,0 +1,129 @@
+import random
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, update, delete, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import BACKGROUND_FAILURES
+from app.core.tracing import tracer, inject_trace_context, extract_trace_context
+from app.models.jobs import Job
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+JobHandler = Callable[[Session, Dict], Awaitable[None]]
+
+# kind -> handler(session, payload). Modules owning the work register their handlers on import.
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(kind: str):
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+async def enqueue_job(session: Session, kind: str, payload: Dict, max_attempts: Optional[int] = None,
+                      delay_seconds: float = 0) -> str:
+    """
+    Add a job to the caller's transaction. The caller is responsible for committing.
+    """
+    job = Job(id=str(uuid4()),
+              kind=kind,
+              payload=jsonable_encoder(inject_trace_context(payload)),
+              status="queued",
+              attempts=0,
+              max_attempts=max_attempts or settings.job_max_attempts,
+              run_at=datetime.now(timezone.utc) + timedelta(seconds=delay_seconds))
+    session.add(job)
+    return job.id
+
+
+async def submit_job(kind: str, payload: Dict, max_attempts: Optional[int] = None, delay_seconds: float = 0) -> str:
+    """
+    Enqueue a job in its own short transaction.
+    """
+    async with SessionLocal() as session:
+        job_id = await enqueue_job(session, kind, payload, max_attempts=max_attempts, delay_seconds=delay_seconds)
+        await session.commit()
+    logger.debug(f"Job {kind} enqueued with id: {job_id}")
+    return job_id
+
+
+async def claim_job(session: Session) -> Optional[Job]:
+    """
+    Claim the next due job with SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never block each other.
+    Jobs left 'running' past the lock timeout (crashed worker) are claimed again.
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.job_lock_timeout_seconds)
+
+    job = await session.scalar(
+        select(Job)
+        .where(or_(and_(Job.status == "queued", Job.run_at <= now),
+                   and_(Job.status == "running", Job.locked_at < stale_before)))
+        .order_by(Job.run_at)
+        .limit(1)
+        .with_for_update(skip_locked=True))
+
+    if job is None:
+        await session.rollback()
+        return None
+
+    job.status = "running"
+    job.locked_at = now
+    job.attempts += 1
+    await session.commit()
+    return job
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    delay = min(settings.job_retry_max_delay_seconds, settings.job_retry_base_delay_seconds * (2 ** (attempts - 1)))
+    # Jitter so jobs that failed together do not retry together
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def run_job(job: Job) -> bool:
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+
+        # The job span continues the trace of the request that enqueued it
+        payload, parent = extract_trace_context(job.payload)
+        with tracer.start_as_current_span(f"job.{job.kind}", context=parent,
+                                          attributes={"job.id": job.id, "job.attempt": job.attempts}):
+            async with SessionLocal() as session:
+                await handler(session, payload)
+
+        async with SessionLocal() as session:
+            await session.execute(delete(Job).where(Job.id == job.id))
+            await session.commit()
+        logger.debug(f"Job {job.kind} ({job.id}) completed")
+        return True
+
+    except Exception as e:
+        BACKGROUND_FAILURES.labels(f"job:{job.kind}").inc()
+        logger.warning(f"Job {job.kind} ({job.id}) failed on attempt {job.attempts}/{job.max_attempts}: {e}")
+        logger.debug(traceback.format_exc())
+
+        values = {"locked_at": None, "last_error": f"{type(e).__name__}: {e}"[:2000]}
+        if job.attempts >= job.max_attempts:
+            values["status"] = "failed"
+            logger.error(f"Job {job.kind} ({job.id}) exhausted its retries")
+        else:
+            values["status"] = "queued"
+            values["run_at"] = datetime.now(timezone.utc) + timedelta(seconds=retry_delay_seconds(job.attempts))
+
+        async with SessionLocal() as session:
+            await session.execute(update(Job).where(Job.id == job.id).values(**values))
+            await session.commit()
+        return False
@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.utils import password_worker
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when too many hash / verify calls are already waiting for the pool, or when the pool
+    broke under a call (it is restarted for the next one).
+    """
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a pool of worker processes so hashing never blocks the event loop.
+
+    The pool is started on first use with `workers` processes (spawned, so they do not inherit
+    the parent's event loop or connections). At most `max_pending` calls may be queued or running;
+    beyond that PasswordHasherBusy is raised at once instead of letting a login burst queue up without bound.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started password hashing pool with {self.workers} workers")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            raise PasswordHasherBusy(f"{self._pending} password operations already pending")
+        self._pending += 1
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM killed). Every call in flight fails with this; only the first one
+            # replaces the pool, and a late failure from the old pool never touches its replacement.
+            if self._executor is executor:
+                logger.error("Password hashing pool is broken, restarting it")
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise PasswordHasherBusy("password hashing pool was restarted") from e
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(password_worker.hash_password, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        (valid, new hash or None). Callers store the new hash to migrate accounts to the current cost or scheme.
+        """
+        return await self._run(password_worker.verify_and_update, password, hashed_password, self.rounds)
+
+    def stats(self):
+        return {"workers": self.workers, "pending": self._pending, "started": self._executor is not None}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(workers=settings.password_hash_workers or os.cpu_count() or 1,
+                                 max_pending=settings.password_hash_max_pending,
+                                 rounds=settings.bcrypt_rounds)
@@ -1,10 +1,10 @@
-from passlib.context import CryptContext
 import jwt
 import string
 import secrets
 from typing import Optional
 from datetime import datetime, timedelta, timezone
 from fastapi import status
+from sqlalchemy.dialects.postgresql import insert
 from app.models.auth import OTPVerification
 from app.schemas.common import APIResponse
 from app.core.config import settings
@@ -35,14 +35,6 @@ def is_password_strong_enough(password: str) -> bool:
 
     return True
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(plain_password):
-    return pwd_context.hash(plain_password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
 
 def generate_otp(length: int = settings.otp_length) -> str:
 
@@ -53,55 +45,53 @@ def generate_otp(length: int = settings.otp_length) -> str:
     return otp.zfill(length)
 
 
-async def create_and_store_otp(session, email: str, request_type: str) -> int:
-
-    existing_record = session.query(OTPVerification).filter(OTPVerification.email == email).first()
-    cooldown_period = timedelta(seconds = settings.otp_cooldown_period_seconds)
-    now = datetime.now()
+async def create_and_store_otp(session, email: str, request_type: str) -> str:
+    """
+    Store a new OTP for `email` and return it, or an APIResponse while the previous one is in its cooldown.
+    One upsert on the unique email index: the existing row is only replaced once it is older than the cooldown.
+    """
+    now = datetime.now(timezone.utc)
+    otp = generate_otp()
+    
+    stmt = insert(OTPVerification).values(id=str(uuid4()),
+                                          email=email,
+                                          otp_code=otp,
+                                          request_type=request_type,
+                                          expires_at=now + timedelta(minutes=settings.otp_expire_minutes),
+                                          created_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OTPVerification.email],
+        set_={"otp_code": stmt.excluded.otp_code,
+              "request_type": stmt.excluded.request_type,
+              "expires_at": stmt.excluded.expires_at,
+              "created_at": now,
+              "updated_at": now},
+        where=OTPVerification.created_at <= now - timedelta(seconds=settings.otp_cooldown_period_seconds),
+    ).returning(OTPVerification.id)
     
-    if existing_record and (now - existing_record.created_at) < cooldown_period:
+    try:
+        stored = (await session.execute(stmt)).scalar_one_or_none()
+        await session.commit()
+    except Exception as e:
+        # Roll back the transaction in case of an error
+        await session.rollback()
+        logger.error(f"Error storing OTP: {e}")
+        logger.error(traceback.format_exc())
+        return APIResponse(
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        message = "Something went wrong",
+        data = None)
+    
+    if stored is None:
         logger.info(f"OTP request for {email} denied due to cooldown period.")
         return APIResponse(
             status=status.HTTP_429_TOO_MANY_REQUESTS,
-            message = "OTP already requested for email less than 30 seconds ago. Please wait before requesting a new one.",
+            message = f"OTP already requested for email less than {settings.otp_cooldown_period_seconds} seconds ago. "
+                      "Please wait before requesting a new one.",
             data = None
         )
+    return otp
 
-    else:
-    
-        otp = generate_otp()
-        expires_at = datetime.now(timezone.utc) + timedelta(minutes=10)
-        
-        try:
-            if existing_record:
-                existing_record.otp_code = otp
-                existing_record.created_at = now # Update the creation time
-                existing_record.expires_at = expires_at
-                existing_record.request_type = request_type
-                session.add(existing_record)
-                session.commit()
-            else:
-                new_otp_record = OTPVerification(
-                    id=str(uuid4()),
-                    email=email,
-                    otp_code=otp,
-                    expires_at=expires_at,
-                    request_type=request_type
-                )
-                session.add(new_otp_record)
-                session.commit()
-                session.refresh(new_otp_record)
-            return otp
-        except Exception as e:
-            # Roll back the transaction in case of an error
-            session.rollback()
-            logger.error(f"Error storing OTP: {e}")
-            logger.error(traceback.format_exc())
-            return APIResponse(
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            message = "Something went wrong",
-            data = None)
-            
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -1,70 +1,168 @@
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from typing import Dict
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from typing import Dict, List, Optional
 import traceback
-from datetime import datetime, timezone
-from app.models.chats import ChatTranscript, ChatSession
+import asyncio
+import json
+from datetime import datetime
+from app.models.chats import ChatTranscript
+from app.core.database import SessionLocal
+from app.core.config import settings
+from app.services.job_queue_services import register_job_handler, submit_job
+from app.core.metrics import BACKGROUND_FAILURES
+from app.core.tracing import tracer
 
 from app.core.app_logger import setup_daily_logger
 logger = setup_daily_logger(logger_name=__name__)
 
-def session_writer(session: Session, content : Dict):
-    
+def _dead_letter(row: Dict, error: Exception):
+    # The full row is logged so it can be replayed by hand
+    BACKGROUND_FAILURES.labels("transcript_dead_letter").inc()
+    logger.error(f"Dropping {ChatTranscript.__tablename__} row that cannot be written ({type(error).__name__}: "
+                 f"{str(error).splitlines()[0]}): {json.dumps(row, default=str)}")
+
+
+async def write_transcript_batch(session: Session, transcripts: List[Dict]) -> int:
+    """
+    Insert transcripts as one multi-row INSERT and commit.
+    When the batch breaks a constraint (e.g. a transcript of a session deleted meanwhile) it is written
+    again row by row, each in a savepoint, and only the failing rows are dead-lettered. Returns their count.
+    Other errors are raised to the caller (buffer flush or job worker) so the batch can be retried.
+    """
     try:
-        new_entry = ChatSession(**content)
-        session.add(new_entry)
-        session.commit()
-        session.refresh(new_entry)
-        
-        logger.debug(f"Chat Session created with id: {new_entry.id}")
+        if transcripts:
+            await session.execute(insert(ChatTranscript), transcripts)
+        await session.commit()
+        return 0
+    except IntegrityError as e:
+        await session.rollback()
+        logger.warning(f"Transcript batch rejected, retrying row by row: {str(e).splitlines()[0]}")
     
-    except SQLAlchemyError as e:
-        # Roll back the session in case of any database error
-        session.rollback()
-        logger.warning(f"Failed to save record. Rolling back transaction. Error: {e}")
-        logger.error(traceback.format_exc())
-    except Exception as e:
-        logger.warning(f"An unexpected error occurred: {e}")
-        logger.error(traceback.format_exc())
+    dead = 0
+    for row in transcripts:
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(ChatTranscript), [row])
+        except IntegrityError as e:
+            dead += 1
+            _dead_letter(row, e)
+    await session.commit()
+    return dead
 
-def session_updater(session: Session, thread_id: str, **kwargs):
-    try:
-        existing_entry = session.query(ChatSession).filter(ChatSession.id == thread_id).first()
-        
-        if existing_entry:
-            for key, value in kwargs.items():
-                setattr(existing_entry, key, value)
+
+def _restore_timestamps(content: Dict) -> Dict:
+    # Job payloads are JSON, so datetimes arrive as ISO strings
+    restored = dict(content)
+    for key in ("created_at", "updated_at"):
+        if isinstance(restored.get(key), str):
+            restored[key] = datetime.fromisoformat(restored[key])
+    return restored
+
+
+@register_job_handler("transcript_batch")
+async def transcript_batch_job(session: Session, payload: Dict):
+    await write_transcript_batch(session, [_restore_timestamps(content) for content in payload.get("transcripts", [])])
+
+
+class TranscriptBuffer:
+    """
+    Process-wide write-behind buffer for ChatTranscript rows.
+    Rows are collected in memory and written as one multi-row INSERT
+    when `max_rows` is reached or every `flush_interval` seconds, whichever comes first.
+    ChatSession rows are not buffered: they are written by the request that creates the session,
+    so every worker can resolve a thread as soon as its id has been returned.
+    """
+    
+    def __init__(self, max_rows: int, flush_interval: float, max_pending: int):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._transcripts: List[Dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+    
+    def __len__(self):
+        return len(self._transcripts)
+    
+    def add_transcript(self, content: Dict):
+        self._transcripts.append(content)
+        self._maybe_flush()
+    
+    def has_pending(self, session_id: str) -> bool:
+        # At most max_rows entries between flushes, so a scan is cheap
+        return any(content["thread_id"] == session_id for content in self._transcripts)
+    
+    def discard_session(self, session_id: str) -> int:
+        """
+        Drop the buffered transcripts of a deleted session, which could no longer be written.
+        """
+        kept = [content for content in self._transcripts if content["thread_id"] != session_id]
+        dropped = len(self._transcripts) - len(kept)
+        self._transcripts = kept
+        return dropped
+    
+    def _maybe_flush(self):
+        if len(self) >= self.max_rows and not self._flush_lock.locked():
+            asyncio.get_running_loop().create_task(self.flush())
+    
+    async def flush(self):
+        async with self._flush_lock:
+            if not len(self):
+                return
+            
+            transcripts, self._transcripts = self._transcripts, []
+            
+            try:
+                with tracer.start_as_current_span("transcript_buffer.flush", attributes={"transcripts": len(transcripts)}):
+                    if settings.job_queue_enabled:
+                        # Hand the batch to the worker; the API process only inserts one job row
+                        await submit_job("transcript_batch", {"transcripts": transcripts})
+                    else:
+                        async with SessionLocal() as session:
+                            await write_transcript_batch(session, transcripts)
+                
+                logger.debug(f"Flushed {len(transcripts)} transcripts")
             
-            existing_entry.updated_at = datetime.now(timezone.utc)
-            session.add(existing_entry)
-            session.commit()
-            session.refresh(existing_entry)
-            logger.debug(f"Chat Session with id: {thread_id} updated successfully.")
-        else:
-            logger.warning(f"No Chat Session found with id: {thread_id}. Update skipped.")
+            except SQLAlchemyError as e:
+                BACKGROUND_FAILURES.labels("transcript_flush").inc()
+                logger.warning(f"Failed to flush transcript buffer. Error: {e}")
+                logger.error(traceback.format_exc())
+                self._requeue(transcripts)
+            except Exception as e:
+                BACKGROUND_FAILURES.labels("transcript_flush").inc()
+                logger.warning(f"An unexpected error occurred while flushing transcript buffer: {e}")
+                logger.error(traceback.format_exc())
+                self._requeue(transcripts)
     
-    except SQLAlchemyError as e:
-        session.rollback()
-        logger.warning(f"Failed to save record. Rolling back transaction. Error: {e}")
-        logger.error(traceback.format_exc())
-    except Exception as e:
-        logger.warning(f"An unexpected error occurred: {e}")
-        logger.error(traceback.format_exc())
+    def _requeue(self, transcripts: List[Dict]):
+        # Keep the failed batch for the next flush unless that would grow the buffer past max_pending
+        if len(self) + len(transcripts) > self.max_pending:
+            BACKGROUND_FAILURES.labels("transcript_dropped").inc()
+            logger.error(f"Transcript buffer full, dropping {len(transcripts)} transcripts")
+            return
+        self._transcripts = transcripts + self._transcripts
     
-
-def transcript_writer(session: Session, content : Dict):
-    try:
-        new_entry = ChatTranscript(**content)
-        session.add(new_entry)
-        session.commit()
-        session.refresh(new_entry)
-        
-        logger.debug(f"Chat Transcript created with id: {new_entry.id}")
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
     
-    except SQLAlchemyError as e:
-        session.rollback()
-        logger.warning(f"Failed to save record. Rolling back transaction. Error: {e}")
-        logger.error(traceback.format_exc())
-    except Exception as e:
-        logger.warning(f"An unexpected error occurred: {e}")
-        logger.error(traceback.format_exc())       
\ No newline at end of file
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+
+transcript_buffer = TranscriptBuffer(max_rows=settings.transcript_buffer_max_rows,
+                                     flush_interval=settings.transcript_buffer_flush_interval_seconds,
+                                     max_pending=settings.transcript_buffer_max_pending_rows)
@@ -0,0 +1,27 @@
+"""
+Functions run inside the password hashing process pool.
+
+Kept free of app imports so spawned workers start quickly and never build settings, models or the chat model.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=4)
+def _context(rounds: int) -> CryptContext:
+    # min_rounds is what needs_update / verify_and_update compare against; the default cost alone
+    # would never flag a hash made before bcrypt_rounds was raised
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """
+    (valid, new hash or None). A new hash is returned when the stored one uses an outdated scheme or cost.
+    """
+    return _context(rounds).verify_and_update(password, hashed_password)
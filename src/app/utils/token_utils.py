@@ -0,0 +1,21 @@
+import math
+import re
+from typing import Iterable, Optional
+
+# Rough local token estimate, no tokenizer download or network call:
+# each word costs ~1 token per 4 characters and every punctuation mark costs 1.
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Role / separator overhead the chat format adds per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def estimate_message_tokens(messages: Iterable) -> int:
+    return sum(estimate_tokens(message.content if isinstance(message.content, str) else str(message.content))
+               + MESSAGE_OVERHEAD_TOKENS for message in messages)
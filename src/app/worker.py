@@ -0,0 +1,79 @@
+"""
+Background job worker.
+
+    python -m app.worker --concurrency 4
+
+Runs the jobs enqueued through app.services.job_queue_services outside the API process.
+"""
+import argparse
+import asyncio
+import signal
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.tracing import setup_tracing, shutdown_tracing
+from prometheus_client import start_http_server
+from app.services.job_queue_services import claim_job, run_job, JOB_HANDLERS
+from app.services.email_transport import email_transport
+
+# Importing these modules registers their job handlers
+import app.utils.chat_background_utils  # noqa: F401
+import app.services.email_services  # noqa: F401
+import app.services.checkpoint_maintenance_services  # noqa: F401
+
+from app.core.app_logger import setup_daily_logger
+logger = setup_daily_logger(logger_name=__name__)
+
+
+async def worker_loop(worker_id: int, stop: asyncio.Event, poll_interval: float):
+    while not stop.is_set():
+        try:
+            async with SessionLocal() as session:
+                job = await claim_job(session)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await run_job(job)
+
+
+async def main(concurrency: int, poll_interval: float):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    setup_tracing(f"{settings.app_name} worker")
+    if settings.job_worker_metrics_port:
+        # The worker serves no HTTP API, so job failures and its DB timings are exposed on their own port
+        try:
+            start_http_server(settings.job_worker_metrics_port)
+            logger.info(f"Serving worker metrics on port {settings.job_worker_metrics_port}")
+        except OSError as e:
+            # e.g. a second worker on the same host; jobs still run, only this worker's metrics are missing
+            logger.warning(f"Worker metrics not served on port {settings.job_worker_metrics_port}: {e}")
+    logger.info(f"Starting job worker with concurrency={concurrency}, handlers={sorted(JOB_HANDLERS)}")
+    try:
+        # Each loop finishes its current job before exiting on shutdown
+        await asyncio.gather(*(worker_loop(i, stop, poll_interval) for i in range(concurrency)))
+    finally:
+        await email_transport.close()
+        await engine.dispose()
+        shutdown_tracing()
+        logger.info("Job worker stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the background job worker")
+    parser.add_argument("--concurrency", type=int, default=settings.job_worker_concurrency)
+    parser.add_argument("--poll-interval", type=float, default=settings.job_poll_interval_seconds)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.concurrency, args.poll_interval))
@@ -0,0 +1,3 @@
+"""
+End-to-end latency benchmarks for the API, see benchmarks/run.py.
+"""
@@ -0,0 +1,70 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Linear-interpolated percentile of `values` (0 <= pct <= 100).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Recorder:
+    """
+    Collects latency, errors and DB round trips per endpoint label.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.statements: Dict[str, List[int]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @asynccontextmanager
+    async def measure(self, label: str):
+        """
+        Time the block. The caller stores the request's DB round trips in the yielded dict's "statements".
+        """
+        sample = {"statements": None}
+        started = time.perf_counter()
+        try:
+            yield sample
+        except Exception:
+            self.errors[label] = self.errors.get(label, 0) + 1
+            raise
+        finally:
+            self.samples.setdefault(label, []).append(time.perf_counter() - started)
+            if sample["statements"] is not None:
+                self.statements.setdefault(label, []).append(sample["statements"])
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict:
+        wall = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for label, samples in sorted(self.samples.items()):
+            statements = self.statements.get(label)
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": self.errors.get(label, 0),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+                "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+                "db_round_trips": round(sum(statements) / len(statements), 2) if statements else None,
+            }
+        total = sum(len(samples) for samples in self.samples.values())
+        return {"wall_seconds": round(wall, 3),
+                "total_requests": total,
+                "throughput_rps": round(total / wall, 2) if wall else 0.0,
+                "endpoints": endpoints}
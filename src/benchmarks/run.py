@@ -0,0 +1,200 @@
+"""
+End-to-end API benchmark: scripted user journeys against the real app, reporting p50/p95/p99 latency,
+throughput and DB round trips per endpoint.
+
+    # in-process through httpx's ASGI transport (default), with the offline fake model
+    python -m benchmarks.run --users 20 --sessions 2 --turns 4 --output bench.json
+
+    # against a real uvicorn server (spawned here unless --url points at a running one)
+    python -m benchmarks.run --mode server --workers 2 --output bench.json
+
+    # compare with a stored baseline, exit 1 if an endpoint got slower by more than 10%
+    python -m benchmarks.run --baseline baseline.json --threshold 0.10 --fail-on-regression
+
+Needs the same .env as the app (a migrated database is used for real). DB round trips are the
+SQLAlchemy statements issued while serving each request, read from the X-DB-Query-Count header
+(only sent when the server runs with environment=development or test);
+LangGraph checkpoint traffic goes through its own psycopg pool and is not included.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+
+async def run_inprocess(args):
+    import httpx
+    from app.main import app
+    from benchmarks.recorder import Recorder
+
+    async with app.router.lifespan_context(app):
+        recorder = Recorder()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            failed = await run_users(client, recorder, args)
+    return recorder, failed
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_healthy(client, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"Server did not become healthy within {timeout:.0f}s")
+        await asyncio.sleep(0.5)
+
+
+async def run_server(args):
+    import httpx
+    from benchmarks.recorder import Recorder
+
+    server = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                                   "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+                                  env=os.environ.copy())
+
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+            await _wait_until_healthy(client, args.startup_timeout)
+            # Created after startup so the wall clock only covers the benchmark itself
+            recorder = Recorder()
+            failed = await run_users(client, recorder, args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+    return recorder, failed
+
+
+async def run_users(client, recorder, args) -> int:
+    from benchmarks.scenarios import run_user, new_run_id
+
+    run_id = new_run_id()
+    results = await asyncio.gather(*(run_user(client, recorder, run_id, index, sessions=args.sessions,
+                                              turns=args.turns, cleanup=not args.keep_users)
+                                     for index in range(args.users)),
+                                   return_exceptions=True)
+    recorder.stop()
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors[:5]:
+        print(f"user journey failed: {error}", file=sys.stderr)
+    return len(errors)
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    Per-endpoint deltas against a baseline run. An endpoint regresses when its p95 grew by more than
+    `threshold` (relative) or it now needs more DB round trips.
+    """
+    rows, regressions = [], []
+    current, previous = results["endpoints"], baseline["results"]["endpoints"]
+    for label in sorted(set(current) | set(previous)):
+        if label not in current or label not in previous:
+            rows.append((label, "only in " + ("current" if label in current else "baseline")))
+            continue
+        now, before = current[label], previous[label]
+        deltas = {metric: (now[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+                  for metric in ("p50_ms", "p95_ms", "p99_ms")}
+        line = "  ".join(f"{metric[:-3]} {before[metric]:.1f}->{now[metric]:.1f}ms ({deltas[metric]:+.1%})"
+                         for metric in deltas)
+        if now["db_round_trips"] is not None and before["db_round_trips"] is not None:
+            line += f"  db {before['db_round_trips']}->{now['db_round_trips']}"
+            if now["db_round_trips"] > before["db_round_trips"]:
+                regressions.append(f"{label}: DB round trips {before['db_round_trips']} -> {now['db_round_trips']}")
+        if deltas["p95_ms"] > threshold:
+            regressions.append(f"{label}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms ({deltas['p95_ms']:+.1%})")
+        rows.append((label, line))
+    return rows, regressions
+
+
+def print_report(report: dict):
+    results = report["results"]
+    print(f"{results['total_requests']} requests in {results['wall_seconds']}s "
+          f"({results['throughput_rps']} req/s), {report['failed_users']} failed user journeys")
+    print(f"{'endpoint':<36}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'db':>7}")
+    for label, stats in results["endpoints"].items():
+        db = "-" if stats["db_round_trips"] is None else stats["db_round_trips"]
+        print(f"{label:<36}{stats['requests']:>6}{stats['errors']:>5}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['throughput_rps']:>9}{db:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark for the chatbot API")
+    parser.add_argument("--mode", choices=["inprocess", "server"], default="inprocess")
+    parser.add_argument("--url", default=None, help="server mode: benchmark a running server instead of spawning one")
+    parser.add_argument("--workers", type=int, default=1, help="server mode: uvicorn workers to spawn")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--sessions", type=int, default=1, help="chat sessions per user")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per session")
+    parser.add_argument("--llm-backend", default="fake",
+                        help="llm_backend setting for the app under test ('gemini' to use the real model)")
+    parser.add_argument("--real-email", action="store_true", help="really send signup emails")
+    parser.add_argument("--keep-users", action="store_true", help="do not delete benchmark accounts afterwards")
+    parser.add_argument("--output", default=None, help="write the JSON results here")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative p95 increase counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # Must be in place before app.core.config builds the settings (also inherited by a spawned server)
+    os.environ["llm_backend"] = args.llm_backend  # setting names are case sensitive
+    # Every virtual user shares one client address and would trip the per-IP auth limits
+    os.environ["rate_limit_enabled"] = "false"
+    if not args.real_email:
+        # Signup sends an OTP mail; keep benchmark users away from the real SMTP server
+        os.environ["email_backend"] = "memory"
+
+    runner = run_inprocess if args.mode == "inprocess" else run_server
+    recorder, failed = asyncio.run(runner(args))
+
+    report = {"meta": {"mode": args.mode,
+                       "users": args.users,
+                       "sessions": args.sessions,
+                       "turns": args.turns,
+                       "llm_backend": args.llm_backend,
+                       "workers": args.workers if args.mode == "server" else None,
+                       "started_at": datetime.now(timezone.utc).isoformat()},
+              "failed_users": failed,
+              "results": recorder.summary()}
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            rows, regressions = compare(report["results"], json.load(handle), args.threshold)
+        print("\nagainst baseline:")
+        for label, line in rows:
+            print(f"  {label:<36}{line}")
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
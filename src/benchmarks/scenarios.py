@@ -0,0 +1,108 @@
+import uuid
+from typing import Dict, Optional
+
+import httpx
+from sqlalchemy import select
+
+from app.core.database import SessionLocal
+from app.models.auth import OTPVerification
+from benchmarks.recorder import Recorder
+
+BENCH_PASSWORD = "Bench@Passw0rd"
+CHAT_PROMPTS = [
+    "What can you help me with?",
+    "Explain the difference between a process and a thread.",
+    "Give me three tips for writing readable Python.",
+    "Summarise what we talked about so far.",
+]
+
+
+class BenchmarkError(Exception):
+    """
+    A request failed, either at the HTTP level or with an APIResponse status >= 400.
+    """
+
+
+class BenchUser:
+    """
+    One virtual user driving the API through an httpx client, timing every call on the recorder.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, run_id: str, index: int):
+        self.client = client
+        self.recorder = recorder
+        self.username = f"bench_{run_id}_{index}"
+        self.email = f"{self.username}@bench.example.com"
+        self.token: Optional[str] = None
+
+    async def call(self, label: str, method: str, url: str, **kwargs) -> Dict:
+        if self.token:
+            kwargs.setdefault("headers", {})["Authorization"] = f"Bearer {self.token}"
+        async with self.recorder.measure(label) as sample:
+            response = await self.client.request(method, url, **kwargs)
+            # SQLAlchemy statements run while serving the request, reported by QueryStatsMiddleware
+            if "x-db-query-count" in response.headers:
+                sample["statements"] = int(response.headers["x-db-query-count"])
+            if response.status_code >= 400:
+                raise BenchmarkError(f"{label}: HTTP {response.status_code} {response.text[:200]}")
+            body = response.json()
+            # Endpoints report failures in the APIResponse body with HTTP 200
+            if isinstance(body, dict) and isinstance(body.get("status"), int) and body["status"] >= 400:
+                raise BenchmarkError(f"{label}: {body['status']} {body.get('message')}")
+        return body
+
+    async def read_otp(self) -> str:
+        # Read straight from the database, outside the timed request
+        async with SessionLocal() as session:
+            record = await session.scalar(select(OTPVerification).where(OTPVerification.email == self.email))
+        if record is None:
+            raise BenchmarkError(f"No OTP stored for {self.email}")
+        return record.otp_code
+
+    async def signup_verify_login(self):
+        body = await self.call("POST /auth/signup", "POST", "/auth/signup",
+                               json={"username": self.username, "email": self.email, "password": BENCH_PASSWORD})
+        unique_token = body["data"]["unique_token"]
+        await self.call("POST /auth/verify_otp", "POST", "/auth/verify_otp",
+                        json={"unique_token": unique_token, "otp": await self.read_otp()})
+        body = await self.call("POST /auth/login", "POST", "/auth/login",
+                               json={"email": self.email, "password": BENCH_PASSWORD})
+        self.token = body["data"]["token_details"]["token"]
+
+    async def chat_session(self, turns: int) -> str:
+        body = await self.call("POST /chatbot/chat (new session)", "POST", "/chatbot/chat")
+        thread_id = body["data"]["thread_id"]
+        for turn in range(turns):
+            await self.call("POST /chatbot/chat (turn)", "POST", "/chatbot/chat",
+                            json={"user_input": CHAT_PROMPTS[turn % len(CHAT_PROMPTS)], "thread_id": thread_id})
+        return thread_id
+
+    async def list_history(self, thread_id: str):
+        await self.call("POST /chatbot/get_sessions", "POST", "/chatbot/get_sessions",
+                        json={"page": 1, "page_size": 20})
+        await self.call("POST /chatbot/get_transcripts", "POST", "/chatbot/get_transcripts",
+                        json={"page": 1, "page_size": 50, "thread_id": thread_id})
+
+    async def delete_account(self):
+        await self.call("DELETE /auth/delete_account", "DELETE", "/auth/delete_account")
+
+
+async def run_user(client: httpx.AsyncClient, recorder: Recorder, run_id: str, index: int,
+                   sessions: int, turns: int, cleanup: bool = True):
+    """
+    The full scripted journey for one virtual user: signup -> verify -> login, then `sessions` times
+    a new chat session with `turns` turns followed by session and transcript listing.
+    """
+    user = BenchUser(client, recorder, run_id, index)
+    await user.signup_verify_login()
+    try:
+        for _ in range(sessions):
+            thread_id = await user.chat_session(turns)
+            await user.list_history(thread_id)
+    finally:
+        if cleanup:
+            await user.delete_account()
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:8]
@@ -0,0 +1,118 @@
+import asyncio
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.core.checkpoint_cache import CachedCheckpointSaver
+
+
+def _config(thread_id="thread-1", checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+async def _put(saver, thread_id="thread-1", messages=("hello",), parent=None):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": list(messages)}
+    checkpoint["channel_versions"] = {"messages": 1}
+    return await saver.aput(parent or _config(thread_id), checkpoint, {"source": "loop", "step": 0}, {"messages": 1})
+
+
+def test_latest_checkpoint_is_served_from_memory():
+    saver = CachedCheckpointSaver(MemorySaver())
+
+    async def run():
+        written = await _put(saver)
+        cached = await saver.aget_tuple(_config())
+        return written, cached
+
+    written, cached = asyncio.run(run())
+    assert cached.config["configurable"]["checkpoint_id"] == written["configurable"]["checkpoint_id"]
+    assert cached.checkpoint["channel_values"]["messages"] == ["hello"]
+    assert saver.stats()["hits"] == 1
+    assert saver.stats()["misses"] == 0
+
+
+def test_cached_entries_are_isolated_from_mutation():
+    saver = CachedCheckpointSaver(MemorySaver())
+
+    async def run():
+        await _put(saver)
+        (await saver.aget_tuple(_config())).checkpoint["channel_values"]["messages"].append("mutated")
+        return await saver.aget_tuple(_config())
+
+    assert asyncio.run(run()).checkpoint["channel_values"]["messages"] == ["hello"]
+
+
+def test_pending_writes_evict_the_entry():
+    saver = CachedCheckpointSaver(MemorySaver())
+
+    async def run():
+        written = await _put(saver)
+        await saver.aput_writes(written, [("messages", ["pending"])], task_id="task-1")
+        return await saver.aget_tuple(_config())
+
+    checkpoint_tuple = asyncio.run(run())
+    assert saver.stats()["misses"] == 1
+    assert [write[1:] for write in checkpoint_tuple.pending_writes] == [("messages", ["pending"])]
+
+
+def test_expired_entries_are_read_from_the_saver():
+    saver = CachedCheckpointSaver(MemorySaver(), ttl_seconds=-1)
+
+    async def run():
+        await _put(saver)
+        return await saver.aget_tuple(_config())
+
+    assert asyncio.run(run()).checkpoint["channel_values"]["messages"] == ["hello"]
+    assert saver.stats()["misses"] == 1
+
+
+def test_other_checkpoint_ids_bypass_the_cache():
+    saver = CachedCheckpointSaver(MemorySaver())
+
+    async def run():
+        first = await _put(saver, messages=("first",))
+        await _put(saver, messages=("second",), parent=first)
+        return await saver.aget_tuple(_config(checkpoint_id=first["configurable"]["checkpoint_id"]))
+
+    assert asyncio.run(run()).checkpoint["channel_values"]["messages"] == ["first"]
+    assert saver.stats()["misses"] == 1
+
+
+def test_least_recently_used_thread_is_evicted():
+    saver = CachedCheckpointSaver(MemorySaver(), max_threads=1)
+
+    async def run():
+        await _put(saver, thread_id="old")
+        await _put(saver, thread_id="new")
+        await saver.aget_tuple(_config("old"))
+
+    asyncio.run(run())
+    assert saver.stats()["misses"] == 1
+    assert saver.stats()["threads"] == 1
+
+
+def test_entries_over_max_bytes_are_not_cached():
+    saver = CachedCheckpointSaver(MemorySaver(), max_bytes=16)
+
+    async def run():
+        await _put(saver, messages=("x" * 100,))
+
+    asyncio.run(run())
+    assert saver.stats()["threads"] == 0
+    assert saver.stats()["bytes"] == 0
+
+
+def test_deleted_threads_leave_the_cache():
+    saver = CachedCheckpointSaver(MemorySaver())
+
+    async def run():
+        await _put(saver)
+        await saver.adelete_thread("thread-1")
+        return await saver.aget_tuple(_config())
+
+    assert asyncio.run(run()) is None
+    assert saver.stats()["threads"] == 0
@@ -0,0 +1,84 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.services.checkpoint_maintenance_services import _THREADS_TO_PRUNE, compact_checkpoints
+
+
+class _Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetchall(self):
+        return self.rows
+
+    async def fetchone(self):
+        return self.rows[0]
+
+
+class _Connection:
+    """
+    Serves `pages` to the selection query in order; every delete reports one row of 10 bytes.
+    """
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.selects = []
+        self.deletes = []
+        self.transactions = 0
+
+    async def execute(self, query, params):
+        if query == _THREADS_TO_PRUNE:
+            self.selects.append(params)
+            return _Cursor(self.pages.pop(0) if self.pages else [])
+        self.deletes.append(params)
+        return _Cursor([(1, 10)])
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+
+def _compact(conn, **kwargs):
+    return asyncio.run(compact_checkpoints(conn, keep_last=2, batch_size=2, **kwargs))
+
+
+def test_pages_continue_after_the_last_thread_namespace_pair():
+    conn = _Connection([[("t1", ""), ("t1", "sub")], [("t1", "zz"), ("t2", "")]])
+
+    report = _compact(conn)
+
+    assert [(params["after_thread"], params["after_ns"]) for params in conn.selects] == [
+        ("", ""), ("t1", "sub"), ("t2", "")]
+    # The rest of t1's namespaces are picked up by the second page, not skipped
+    assert conn.deletes[3]["threads"] == ["t1", "t2"]
+    assert conn.deletes[3]["namespaces"] == ["zz", ""]
+    assert report["threads"] == 2
+
+
+def test_each_batch_deletes_in_one_transaction():
+    conn = _Connection([[("t1", "")], [("t2", "")]])
+
+    report = _compact(conn)
+
+    assert conn.transactions == 2
+    assert len(conn.deletes) == 6
+    assert report["checkpoints"] == {"rows": 2, "bytes": 20}
+    assert report["rows_reclaimed"] == 6
+    assert report["bytes_reclaimed"] == 60
+
+
+def test_max_batches_stops_early():
+    conn = _Connection([[("t1", "")], [("t2", "")]])
+
+    report = _compact(conn, max_batches=1)
+
+    assert len(conn.selects) == 1
+    assert report["threads"] == 1
+
+
+def test_keep_last_must_leave_a_checkpoint():
+    with pytest.raises(ValueError):
+        asyncio.run(compact_checkpoints(_Connection([]), keep_last=0, batch_size=2))
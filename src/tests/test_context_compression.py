@@ -0,0 +1,129 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services import chatbot_services
+from app.services.chatbot_services import (compress_thread_state, needs_compression, should_compress,
+                                           split_for_compression, summarize_messages)
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    monkeypatch.setattr(chatbot_services.settings, "context_token_budget", 100)
+    monkeypatch.setattr(chatbot_services.settings, "context_keep_recent_messages", 2)
+
+
+def _turns(count, words=10):
+    return [message for i in range(count)
+            for message in (HumanMessage(content=" ".join(["question"] * words)),
+                            AIMessage(content=" ".join(["answer"] * words)))]
+
+
+def _state(messages, summary=None):
+    return {"messages": messages, "user_input": "next", "turns_to_compress": 3, "summary": summary}
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """
+    (messages, previous summary) of every summarize_messages call.
+    """
+    calls = []
+
+    async def summarize(messages, summary=None, user_id=None):
+        calls.append((messages, summary))
+        return "new summary"
+
+    monkeypatch.setattr(chatbot_services, "summarize_messages", summarize)
+    return calls
+
+
+def test_compression_waits_for_the_token_budget():
+    # Each message estimates to 24 tokens: two turns fit the 100 token budget, four do not
+    assert not needs_compression(_state(_turns(2)))
+    assert needs_compression(_state(_turns(4)))
+
+
+def test_summary_counts_towards_the_budget():
+    assert needs_compression(_state(_turns(1) + _turns(1), summary=" ".join(["earlier"] * 100)))
+
+
+def test_recent_messages_are_never_folded():
+    # Over budget, but nothing older than the kept messages
+    assert not needs_compression(_state(_turns(1, words=200)))
+
+
+def test_split_keeps_the_most_recent_messages():
+    messages = _turns(3)
+
+    older, recent = split_for_compression(_state(messages))
+
+    assert older == messages[:4]
+    assert recent == messages[4:]
+
+
+def test_inline_compression_carries_the_previous_summary(summaries):
+    messages = _turns(4)
+    state = asyncio.run(should_compress(_state(messages, summary="old summary"), {}))
+
+    assert summaries == [(messages[:6], "old summary")]
+    assert state["summary"] == "new summary"
+    assert state["messages"] == messages[6:]
+    assert state["turns_to_compress"] == 0
+
+
+def test_under_budget_state_is_left_alone(summaries):
+    state = asyncio.run(should_compress(_state(_turns(1), summary="old summary"), {}))
+
+    assert summaries == []
+    assert state["summary"] == "old summary"
+
+
+def test_summary_prompt_sends_only_the_new_messages(monkeypatch):
+    prompts = []
+
+    class _Model:
+        async def ainvoke(self, messages):
+            prompts.append(messages[-1].content)
+            return AIMessage(content="merged")
+
+    monkeypatch.setattr(chatbot_services, "model", _Model())
+
+    assert asyncio.run(summarize_messages([HumanMessage(content="new question")], "old summary")) == "merged"
+    assert "Existing summary:\nold summary" in prompts[0]
+    assert "human:new question" in prompts[0]
+
+
+class _Graph:
+    def __init__(self, state, checkpoint_ids):
+        self.state = state
+        self.checkpoint_ids = list(checkpoint_ids)
+        self.updates = []
+
+    async def aget_state(self, config):
+        checkpoint_id = self.checkpoint_ids.pop(0)
+        return SimpleNamespace(values=self.state, config={"configurable": {**config["configurable"],
+                                                                            "checkpoint_id": checkpoint_id}})
+
+    async def aupdate_state(self, config, values, as_node):
+        self.updates.append((config["configurable"]["checkpoint_id"], values))
+
+
+def test_deferred_compression_writes_onto_the_summarised_checkpoint(summaries):
+    messages = _turns(4)
+    graph = _Graph(_state(messages, summary="old summary"), ["cp-1", "cp-1"])
+
+    asyncio.run(compress_thread_state(graph, "thread-1", "user-1"))
+
+    assert summaries == [(messages[:6], "old summary")]
+    assert graph.updates == [("cp-1", {"summary": "new summary", "messages": messages[6:], "turns_to_compress": 0})]
+
+
+def test_deferred_compression_skips_a_thread_that_moved_on(summaries):
+    graph = _Graph(_state(_turns(4)), ["cp-1", "cp-2"])
+
+    asyncio.run(compress_thread_state(graph, "thread-1"))
+
+    assert graph.updates == []
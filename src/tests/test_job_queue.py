@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.jobs import Job
+from app.services import job_queue_services
+from app.services.job_queue_services import claim_job, retry_delay_seconds, run_job
+
+
+def _job(attempts=1, max_attempts=3, kind="test_job"):
+    return Job(id="job-1", kind=kind, payload={"value": 1}, status="running", attempts=attempts,
+               max_attempts=max_attempts, run_at=datetime.now(timezone.utc))
+
+
+def _params(statement):
+    return statement.compile(dialect=postgresql.dialect()).params
+
+
+@pytest.fixture
+def sessions(monkeypatch, fake_session):
+    """
+    Every SessionLocal() opened by run_job, in order.
+    """
+    opened = []
+
+    class _SessionLocal:
+        async def __aenter__(self):
+            opened.append(fake_session())
+            return opened[-1]
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(job_queue_services, "SessionLocal", _SessionLocal)
+    return opened
+
+
+def test_claim_marks_the_job_running(fake_session):
+    job = _job(attempts=0)
+    job.status = "queued"
+    session = fake_session(scalars=[job])
+
+    claimed = asyncio.run(claim_job(session))
+
+    assert claimed is job
+    assert (job.status, job.attempts) == ("running", 1)
+    assert job.locked_at is not None
+    assert session.commits == 1
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_claim_without_a_due_job_releases_the_transaction(fake_session):
+    session = fake_session()
+
+    assert asyncio.run(claim_job(session)) is None
+    assert session.rollbacks == 1
+
+
+def test_successful_job_is_deleted(monkeypatch, sessions):
+    handled = []
+
+    async def handler(session, payload):
+        handled.append(payload)
+
+    monkeypatch.setitem(job_queue_services.JOB_HANDLERS, "test_job", handler)
+
+    assert asyncio.run(run_job(_job())) is True
+    assert handled == [{"value": 1}]
+    [delete] = sessions[1].statements
+    assert _params(delete) == {"id_1": "job-1"}
+
+
+def test_failed_job_is_requeued_with_backoff(monkeypatch, sessions):
+    async def handler(session, payload):
+        raise RuntimeError("smtp down")
+
+    monkeypatch.setitem(job_queue_services.JOB_HANDLERS, "test_job", handler)
+    before = datetime.now(timezone.utc)
+
+    assert asyncio.run(run_job(_job(attempts=1, max_attempts=3))) is False
+    params = _params(sessions[-1].statements[0])
+    assert params["status"] == "queued"
+    assert params["locked_at"] is None
+    assert params["run_at"] > before
+    assert params["last_error"] == "RuntimeError: smtp down"
+
+
+def test_job_out_of_attempts_is_marked_failed(monkeypatch, sessions):
+    async def handler(session, payload):
+        raise RuntimeError("smtp down")
+
+    monkeypatch.setitem(job_queue_services.JOB_HANDLERS, "test_job", handler)
+
+    asyncio.run(run_job(_job(attempts=3, max_attempts=3)))
+
+    params = _params(sessions[-1].statements[0])
+    assert params["status"] == "failed"
+    assert "run_at" not in params
+
+
+def test_unknown_kind_fails_without_running_anything(sessions):
+    assert asyncio.run(run_job(_job(kind="no_such_kind"))) is False
+    assert _params(sessions[-1].statements[0])["last_error"].startswith("LookupError")
+
+
+def test_retry_delay_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(job_queue_services.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(job_queue_services.settings, "job_retry_base_delay_seconds", 2.0)
+    monkeypatch.setattr(job_queue_services.settings, "job_retry_max_delay_seconds", 10.0)
+
+    assert [retry_delay_seconds(attempts) for attempts in range(1, 6)] == [2.0, 4.0, 8.0, 10.0, 10.0]
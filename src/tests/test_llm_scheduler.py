@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from app.core.llm_scheduler import AdmissionRejected, FairShareScheduler
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slots_are_taken_without_waiting_while_free():
+    scheduler = FairShareScheduler(max_concurrency=2, max_queue_depth=10, max_queue_per_user=10)
+
+    async def run():
+        await scheduler.acquire("a")
+        await scheduler.acquire("b")
+
+    asyncio.run(run())
+    assert scheduler.stats()["active"] == 2
+    assert scheduler.queue_depth == 0
+
+
+def test_freed_slots_go_round_robin_across_users():
+    scheduler = FairShareScheduler(max_concurrency=1, max_queue_depth=10, max_queue_per_user=10)
+    served = []
+
+    async def call(user, label):
+        async with scheduler.admit(user):
+            served.append(label)
+            await asyncio.sleep(0)
+
+    async def run():
+        await scheduler.acquire("holder")
+        # One user bursts three calls before another user's single call arrives
+        tasks = [asyncio.create_task(call("a", f"a{i}")) for i in range(3)]
+        await _settle()
+        tasks.append(asyncio.create_task(call("b", "b0")))
+        await _settle()
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert served == ["a0", "b0", "a1", "a2"]
+
+
+def test_full_queue_rejects_with_retry_after():
+    scheduler = FairShareScheduler(max_concurrency=1, max_queue_depth=1, max_queue_per_user=10)
+
+    async def run():
+        await scheduler.acquire("a")
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await _settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await scheduler.acquire("c")
+        waiter.cancel()
+        return rejected.value
+
+    error = asyncio.run(run())
+    assert error.retry_after >= 1
+    assert scheduler.rejected == 1
+
+
+def test_per_user_queue_limit():
+    scheduler = FairShareScheduler(max_concurrency=1, max_queue_depth=10, max_queue_per_user=1)
+
+    async def run():
+        await scheduler.acquire("holder")
+        waiter = asyncio.create_task(scheduler.acquire("a"))
+        await _settle()
+        with pytest.raises(AdmissionRejected):
+            scheduler.check_capacity("a")
+        # Another user still fits
+        scheduler.check_capacity("b")
+        waiter.cancel()
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = FairShareScheduler(max_concurrency=1, max_queue_depth=10, max_queue_per_user=10)
+
+    async def run():
+        await scheduler.acquire("holder")
+        waiter = asyncio.create_task(scheduler.acquire("a"))
+        await _settle()
+        waiter.cancel()
+        await _settle()
+        assert scheduler.queue_depth == 0
+        scheduler.release()
+
+    asyncio.run(run())
+    assert scheduler.stats()["active"] == 0
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    scheduler = FairShareScheduler(max_concurrency=1, max_queue_depth=10, max_queue_per_user=10)
+
+    async def run():
+        await scheduler.acquire("holder")
+        first = asyncio.create_task(scheduler.acquire("a"))
+        second = asyncio.create_task(scheduler.acquire("b"))
+        await _settle()
+        # The slot goes to `first`, which is cancelled before it resumes
+        scheduler.release()
+        first.cancel()
+        await _settle()
+        await second
+        assert first.cancelled()
+
+    asyncio.run(run())
+    assert scheduler.stats()["active"] == 1
+    assert scheduler.queue_depth == 0
+
+
+def test_try_acquire_never_jumps_the_queue():
+    scheduler = FairShareScheduler(max_concurrency=2, max_queue_depth=10, max_queue_per_user=10)
+
+    async def run():
+        assert scheduler.try_acquire()
+        assert scheduler.try_acquire()
+        assert not scheduler.try_acquire()
+        waiter = asyncio.create_task(scheduler.acquire("a"))
+        await _settle()
+        scheduler.release()
+        await waiter
+        scheduler.release()
+        # A slot is free again, but only once nobody is waiting
+        assert scheduler.try_acquire()
+
+    asyncio.run(run())
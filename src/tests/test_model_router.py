@@ -0,0 +1,154 @@
+import asyncio
+from typing import Any, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from app.core.llm_scheduler import FairShareScheduler
+from app.core.model_router import HedgedChatModel
+
+MESSAGES = [HumanMessage(content="hi")]
+
+
+class ScriptedModel(BaseChatModel):
+    """
+    Answers with `reply` after `delay` seconds (or once `gate` is set), or fails when `fail` is set.
+    Every stream it opened is appended to the `closed` list once it is finalised.
+    """
+
+    reply: str
+    delay: float = 0.0
+    fail: bool = False
+    gate: Optional[Any] = None
+    # Any, so the list given is kept as is and can be shared between models
+    closed: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _wait(self):
+        if self.gate is not None:
+            await self.gate.wait()
+        else:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} failed")
+
+    async def ainvoke(self, input, config=None, *, stop=None, **kwargs):
+        await self._wait()
+        return AIMessage(content=self.reply)
+
+    async def astream(self, input, config=None, *, stop=None, **kwargs):
+        try:
+            await self._wait()
+            yield AIMessageChunk(content=self.reply)
+            yield AIMessageChunk(content="!")
+        finally:
+            if self.closed is not None:
+                self.closed.append(self.reply)
+
+
+def _router(*models, scheduler=None, **kwargs):
+    settings = {"hedge_initial_delay": 0.05, "hedge_min_delay": 0.0, "min_samples": 1000, **kwargs}
+    return HedgedChatModel(models=list(models), scheduler=scheduler, **settings)
+
+
+async def _stream_text(router) -> str:
+    return "".join([chunk.content async for chunk in router.astream(MESSAGES)])
+
+
+def test_fast_primary_is_not_hedged():
+    router = _router(ScriptedModel(reply="primary"), ScriptedModel(reply="secondary"))
+
+    assert asyncio.run(router.ainvoke(MESSAGES)).content == "primary"
+    assert router.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged_and_the_secondary_wins():
+    router = _router(ScriptedModel(reply="primary", delay=1.0), ScriptedModel(reply="secondary"))
+
+    assert asyncio.run(router.ainvoke(MESSAGES)).content == "secondary"
+    assert router.stats()["hedged"] == 1
+    assert router.stats()["won_by_secondary"] == 1
+
+
+def test_failing_primary_fails_over():
+    router = _router(ScriptedModel(reply="primary", fail=True), ScriptedModel(reply="secondary"),
+                     hedge_enabled=False)
+
+    assert asyncio.run(router.ainvoke(MESSAGES)).content == "secondary"
+    assert router.stats()["failovers"] == 1
+
+
+def test_last_error_is_raised_when_every_model_fails():
+    router = _router(ScriptedModel(reply="primary", fail=True), ScriptedModel(reply="secondary", fail=True))
+
+    with pytest.raises(RuntimeError, match="secondary failed"):
+        asyncio.run(router.ainvoke(MESSAGES))
+
+
+def test_stream_and_invoke_latencies_are_kept_apart():
+    router = _router(ScriptedModel(reply="primary", delay=0.01), ScriptedModel(reply="secondary"),
+                     min_samples=1, hedge_initial_delay=4.0)
+
+    asyncio.run(router.ainvoke(MESSAGES))
+
+    delays = router.stats()["hedge_delay_seconds"]
+    assert delays["invoke"] < 4.0
+    assert delays["stream"] == 4.0
+
+
+def test_losing_streams_are_closed():
+    closed = []
+    primary = ScriptedModel(reply="primary", closed=closed)
+    secondary = ScriptedModel(reply="secondary", closed=closed)
+    router = _router(primary, secondary, hedge_initial_delay=0.01)
+
+    async def run():
+        # Both first chunks become ready in the same loop iteration, so both tasks end up in one `done` set
+        gate = asyncio.Event()
+        primary.gate = secondary.gate = gate
+        asyncio.get_running_loop().call_later(0.05, gate.set)
+        text = await _stream_text(router)
+        await asyncio.sleep(0.01)
+        return text
+
+    text = asyncio.run(run())
+    assert text in ("primary!", "secondary!")
+    assert sorted(closed) == ["primary", "secondary"]
+
+
+def test_hedge_is_skipped_while_the_scheduler_is_saturated():
+    scheduler = FairShareScheduler(max_concurrency=1, max_queue_depth=10, max_queue_per_user=10)
+    router = _router(ScriptedModel(reply="primary", delay=0.2), ScriptedModel(reply="secondary"),
+                     scheduler=scheduler, hedge_initial_delay=0.02)
+
+    async def run():
+        async with scheduler.admit("user"):
+            return await router.ainvoke(MESSAGES)
+
+    assert asyncio.run(run()).content == "primary"
+    assert router.stats()["hedged"] == 0
+    assert router.stats()["hedges_skipped"] >= 1
+
+
+def test_hedge_holds_its_own_slot_until_the_race_ends():
+    scheduler = FairShareScheduler(max_concurrency=2, max_queue_depth=10, max_queue_per_user=10)
+    router = _router(ScriptedModel(reply="primary", delay=1.0), ScriptedModel(reply="secondary", delay=0.05),
+                     scheduler=scheduler, hedge_initial_delay=0.02)
+
+    async def run():
+        async with scheduler.admit("user"):
+            reply = await router.ainvoke(MESSAGES)
+            # Only the caller's own slot is left
+            assert scheduler.stats()["active"] == 1
+            return reply
+
+    assert asyncio.run(run()).content == "secondary"
+    assert router.stats()["hedged"] == 1
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects import postgresql
+
+from app.schemas.common import APIResponse
+from app.utils import auth_utils
+from app.utils.auth_utils import create_and_store_otp
+
+
+def _store(session):
+    return asyncio.run(create_and_store_otp(session, "a@example.com", request_type="signup"))
+
+
+def test_new_otp_is_stored_with_one_upsert(fake_session):
+    session = fake_session(results=[[("otp-id",)]])
+
+    otp = _store(session)
+
+    assert isinstance(otp, str) and len(otp) == auth_utils.settings.otp_length
+    [upsert] = session.statements
+    compiled = upsert.compile(dialect=postgresql.dialect())
+    assert "ON CONFLICT (email) DO UPDATE" in str(compiled)
+    assert otp in compiled.params.values()
+    assert session.commits == 1
+
+
+def test_replacement_is_limited_to_rows_past_the_cooldown(monkeypatch, fake_session):
+    monkeypatch.setattr(auth_utils.settings, "otp_cooldown_period_seconds", 60)
+    session = fake_session(results=[[("otp-id",)]])
+
+    _store(session)
+
+    compiled = session.statements[0].compile(dialect=postgresql.dialect())
+    # The conflicting row is only overwritten when it was created at least a cooldown ago
+    assert "WHERE wannabeaiops.otp_verification.created_at <=" in str(compiled)
+    cutoff, now = sorted({value for value in compiled.params.values() if isinstance(value, datetime)})[:2]
+    assert now - cutoff == timedelta(seconds=60)
+
+
+def test_request_within_the_cooldown_is_refused(fake_session):
+    # The upsert's WHERE kept the existing row, so nothing is returned
+    session = fake_session()
+
+    response = _store(session)
+
+    assert isinstance(response, APIResponse)
+    assert response.status == 429
+    assert session.commits == 1
+
+
+def test_database_error_rolls_back(fake_session):
+    class _FailingSession(fake_session):
+        async def execute(self, statement, rows=None):
+            raise RuntimeError("connection lost")
+
+    session = _FailingSession()
+
+    response = _store(session)
+
+    assert response.status == 500
+    assert session.rollbacks == 1
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app.services.password_services import PasswordHasher
+from app.utils import password_worker
+
+
+@pytest.fixture
+def hasher():
+    # Low costs keep the test fast; the pool is real, so this also covers the worker round trip
+    hasher = PasswordHasher(workers=1, max_pending=4, rounds=5)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_made_at_a_lower_cost_is_upgraded(hasher):
+    old_hash = password_worker.hash_password("correct horse", rounds=4)
+
+    valid, new_hash = asyncio.run(hasher.verify_and_update("correct horse", old_hash))
+
+    assert valid
+    assert new_hash is not None and new_hash.startswith("$2b$05$")
+    assert password_worker.verify_and_update("correct horse", new_hash, rounds=5) == (True, None)
+
+
+def test_hash_at_the_configured_cost_is_kept(hasher):
+    current = asyncio.run(hasher.hash("correct horse"))
+
+    assert asyncio.run(hasher.verify_and_update("correct horse", current)) == (True, None)
+
+
+def test_wrong_password_is_rejected_without_a_new_hash(hasher):
+    old_hash = password_worker.hash_password("correct horse", rounds=4)
+
+    assert asyncio.run(hasher.verify_and_update("wrong", old_hash)) == (False, None)
@@ -0,0 +1,53 @@
+from app.core import principal_cache as principal_cache_module
+from app.core.principal_cache import PrincipalCache
+from app.schemas.user import CurrentUser
+
+
+def _principal(email="a@example.com"):
+    return CurrentUser(id=f"id-{email}", email=email, username=email.split("@")[0])
+
+
+def test_cached_principal_is_returned_until_it_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principal_cache_module.time, "monotonic", lambda: now[0])
+    cache = PrincipalCache(max_entries=10, ttl_seconds=60)
+
+    cache.set("a@example.com", _principal(), cache.generation())
+    assert cache.get("a@example.com") == _principal()
+
+    now[0] += 61
+    assert cache.get("a@example.com") is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1}
+
+
+def test_invalidate_drops_the_entry():
+    cache = PrincipalCache(max_entries=10, ttl_seconds=60)
+    cache.set("a@example.com", _principal(), cache.generation())
+
+    cache.invalidate("a@example.com")
+
+    assert cache.get("a@example.com") is None
+
+
+def test_lookup_started_before_an_invalidation_is_not_cached():
+    cache = PrincipalCache(max_entries=10, ttl_seconds=60)
+
+    # get_current_user takes the generation, then queries the user; the account changes meanwhile
+    generation = cache.generation()
+    cache.invalidate("a@example.com")
+    cache.set("a@example.com", _principal(), generation)
+
+    assert cache.get("a@example.com") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PrincipalCache(max_entries=2, ttl_seconds=60)
+    for email in ("a@example.com", "b@example.com"):
+        cache.set(email, _principal(email), cache.generation())
+    cache.get("a@example.com")
+
+    cache.set("c@example.com", _principal("c@example.com"), cache.generation())
+
+    assert cache.get("b@example.com") is None
+    assert cache.get("a@example.com") is not None
+    assert cache.get("c@example.com") is not None
@@ -0,0 +1,184 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import InMemoryRateLimitBackend, RateLimiter, RateLimitMiddleware
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_the_burst_then_reports_the_wait(clock):
+    backend = InMemoryRateLimitBackend(shards=4, sweep_interval_seconds=60)
+
+    async def run():
+        return [await backend.acquire("key", capacity=2, refill_per_second=0.5) for _ in range(3)]
+
+    assert asyncio.run(run()) == [0.0, 0.0, 2.0]
+
+
+def test_bucket_refills_over_time(clock):
+    backend = InMemoryRateLimitBackend(shards=4, sweep_interval_seconds=60)
+
+    async def run():
+        await backend.acquire("key", capacity=1, refill_per_second=1)
+        assert await backend.acquire("key", capacity=1, refill_per_second=1) > 0
+        clock[0] += 2
+        return await backend.acquire("key", capacity=1, refill_per_second=1)
+
+    assert asyncio.run(run()) == 0.0
+
+
+def test_sweep_evicts_only_refilled_buckets(clock):
+    backend = InMemoryRateLimitBackend(shards=1, sweep_interval_seconds=10)
+
+    async def run():
+        await backend.acquire("idle", capacity=1, refill_per_second=1)
+        clock[0] += 5
+        await backend.acquire("busy", capacity=10, refill_per_second=0.1)
+        clock[0] += 6
+        # Triggers the sweep: "idle" refilled long ago, "busy" needs 10 more seconds
+        await backend.acquire("new", capacity=1, refill_per_second=1)
+
+    asyncio.run(run())
+    assert len(backend) == 2
+    assert "idle" not in backend._shards[0]
+
+
+class _FailingBackend:
+    async def acquire(self, key, capacity, refill_per_second):
+        raise ConnectionError("redis is down")
+
+
+def test_limiter_lets_requests_through_when_the_backend_fails():
+    limiter = RateLimiter(_FailingBackend(), ip_burst=1, ip_per_minute=1, email_burst=1, email_per_minute=1)
+
+    assert asyncio.run(limiter.check("/auth/login", "10.0.0.1", "a@example.com")) == 0.0
+    assert limiter.stats()["errors"] == 1
+
+
+def test_email_bucket_limits_across_ips(clock):
+    limiter = RateLimiter(InMemoryRateLimitBackend(shards=4, sweep_interval_seconds=60),
+                          ip_burst=10, ip_per_minute=10, email_burst=1, email_per_minute=1)
+
+    async def run():
+        first = await limiter.check("/auth/login", "10.0.0.1", "a@example.com")
+        other_ip = await limiter.check("/auth/login", "10.0.0.2", "a@example.com")
+        other_path = await limiter.check("/auth/signup", "10.0.0.2", "a@example.com")
+        return first, other_ip, other_path
+
+    first, other_ip, other_path = asyncio.run(run())
+    assert first == 0.0
+    assert other_ip > 0
+    assert other_path == 0.0
+
+
+def _call(middleware, path="/auth/login", body=b'{"email": "a@example.com"}', peer="10.0.0.9", forwarded=()):
+    headers = [(b"content-type", b"application/json")] + [(b"x-forwarded-for", value) for value in forwarded]
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers, "client": (peer, 1234)}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+class _RecordingLimiter:
+    def __init__(self, wait=0.0):
+        self.wait = wait
+        self.calls = []
+
+    async def check(self, path, ip, email):
+        self.calls.append((path, ip, email))
+        return self.wait
+
+
+async def _echo_app(scope, receive, send):
+    message = await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": message["body"]})
+
+
+def test_middleware_replays_the_body_it_inspected():
+    limiter = _RecordingLimiter()
+
+    sent = _call(RateLimitMiddleware(_echo_app, limiter, trusted_proxies=0))
+
+    assert sent[-1]["body"] == b'{"email": "a@example.com"}'
+    assert limiter.calls == [("/auth/login", "10.0.0.9", "a@example.com")]
+
+
+def test_middleware_rejects_with_429_and_retry_after():
+    sent = _call(RateLimitMiddleware(_echo_app, _RecordingLimiter(wait=2.5), trusted_proxies=0))
+
+    assert sent[0]["status"] == 429
+    assert (b"retry-after", b"3") in sent[0]["headers"]
+    assert json.loads(sent[1]["body"])["status"] == 429
+
+
+@pytest.mark.parametrize("trusted_proxies, forwarded, expected", [
+    # Without trusted proxies the header is ignored
+    (0, [b"1.1.1.1"], "10.0.0.9"),
+    # A client-supplied entry on the left cannot pick the address
+    (1, [b"6.6.6.6, 1.1.1.1"], "1.1.1.1"),
+    (2, [b"6.6.6.6, 1.1.1.1, 10.0.0.2"], "1.1.1.1"),
+    # Repeated headers are read as one list
+    (2, [b"6.6.6.6, 1.1.1.1", b"10.0.0.2"], "1.1.1.1"),
+    # Fewer entries than proxies: the request did not come through all of them
+    (2, [b"1.1.1.1"], "10.0.0.9"),
+])
+def test_client_ip_is_taken_from_the_trusted_end(trusted_proxies, forwarded, expected):
+    limiter = _RecordingLimiter()
+
+    _call(RateLimitMiddleware(_echo_app, limiter, trusted_proxies=trusted_proxies), forwarded=forwarded)
+
+    assert limiter.calls[0][1] == expected
+
+
+def test_other_paths_are_not_limited():
+    limiter = _RecordingLimiter(wait=10)
+
+    sent = _call(RateLimitMiddleware(_echo_app, limiter, trusted_proxies=0), path="/chatbot/chat")
+
+    assert sent[0]["status"] == 200
+    assert limiter.calls == []
+
+
+def test_body_too_large_to_inspect_is_rejected_with_413():
+    limiter = _RecordingLimiter()
+
+    sent = _call(RateLimitMiddleware(_echo_app, limiter, trusted_proxies=0),
+                 body=b'{"email": "a@example.com", "padding": "' + b"x" * 20000 + b'"}')
+
+    assert sent[0]["status"] == 413
+    assert json.loads(sent[1]["body"])["status"] == 413
+    # Neither bucket is charged and the app never sees the request
+    assert limiter.calls == []
+
+
+def test_declared_content_length_over_the_limit_is_rejected_unread():
+    async def receive():
+        raise AssertionError("the body should not be read")
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/auth/login", "client": ("10.0.0.9", 1234),
+             "headers": [(b"content-length", b"20000")]}
+    asyncio.run(RateLimitMiddleware(_echo_app, _RecordingLimiter(), trusted_proxies=0)(scope, receive, send))
+
+    assert sent[0]["status"] == 413
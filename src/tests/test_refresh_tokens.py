@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.auth import RefreshToken
+from app.schemas.auth import RefreshTokenRequest
+from app.services import auth_services
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def _refresh(session, token="presented-token"):
+    return asyncio.run(auth_services.refresh_access_token(RefreshTokenRequest(refresh_token=token), session))
+
+
+ROTATED = ("user-1", "family-1", "a@example.com")
+
+
+def test_rotation_issues_a_new_token_in_the_same_family(fake_session):
+    session = fake_session(results=[[ROTATED]])
+
+    response = _refresh(session)
+
+    assert response.status == 200
+    new_token = response.data["token_details"]["refresh_token"]
+    [row] = session.added
+    assert isinstance(row, RefreshToken)
+    assert row.family_id == "family-1"
+    assert row.token_hash == auth_services._hash_refresh_token(new_token)
+    assert session.commits == 1
+
+
+def test_claim_accepts_a_just_rotated_token_without_extending_its_grace(fake_session):
+    session = fake_session(results=[[ROTATED]])
+
+    _refresh(session)
+
+    sql = _sql(session.statements[0])
+    # Within the grace window a rotated token may be claimed again...
+    assert "refresh_tokens.replaced_by IS NOT NULL" in sql
+    # ...but the first rotation's timestamp and successor are kept
+    assert "revoked_at=coalesce(wannabeaiops.refresh_tokens.revoked_at" in sql
+    assert "replaced_by=coalesce(wannabeaiops.refresh_tokens.replaced_by" in sql
+
+
+def test_unknown_token_is_rejected_without_revoking_anything(fake_session):
+    session = fake_session()
+
+    response = _refresh(session)
+
+    assert response.status == 401
+    # The claim and the lookup of the presented token, nothing else
+    assert len(session.statements) == 2
+    assert session.rollbacks == 1
+    assert session.commits == 0
+
+
+def test_reuse_after_the_grace_window_revokes_the_family(fake_session):
+    existing = SimpleNamespace(user_id="user-1", family_id="family-1", revoked_at=datetime.now(timezone.utc))
+    session = fake_session(scalars=[existing])
+
+    response = _refresh(session)
+
+    assert response.status == 401
+    assert session.commits == 1
+    revoke = session.statements[2].compile(dialect=postgresql.dialect())
+    assert "family-1" in revoke.params.values()
+    # Tokens still inside the grace window are expired as well, so they cannot be claimed again
+    assert "expires_at=" in str(revoke)
+    assert not session.added
+
+
+def test_logout_revokes_the_family_of_the_token(fake_session):
+    session = fake_session()
+
+    response = asyncio.run(auth_services.logout(RefreshTokenRequest(refresh_token="presented-token"), session))
+
+    assert response.status == 200
+    assert session.commits == 1
+    revoke = session.statements[0].compile(dialect=postgresql.dialect())
+    assert auth_services._hash_refresh_token("presented-token") in revoke.params.values()
@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import OperationalError
+
+from app.utils import chat_background_utils
+from app.utils.chat_background_utils import TranscriptBuffer, write_transcript_batch
+
+
+def _transcript(session_id="session-1", message="hi"):
+    return {"id": str(uuid.uuid4()), "thread_id": session_id, "message": message,
+            "sender": "User", "created_at": datetime.now(timezone.utc)}
+
+
+def test_batch_is_written_with_one_insert(fake_session):
+    session = fake_session()
+    rows = [_transcript() for _ in range(3)]
+
+    dead = asyncio.run(write_transcript_batch(session, rows))
+
+    assert dead == 0
+    assert session.written == rows
+    assert session.rollbacks == 0
+
+
+def test_poison_row_is_dead_lettered_and_the_rest_written(fake_session):
+    rows = [_transcript() for _ in range(4)]
+    session = fake_session(poison={rows[1]["id"]})
+
+    dead = asyncio.run(write_transcript_batch(session, rows))
+
+    assert dead == 1
+    assert session.rollbacks == 1
+    assert [row["id"] for row in session.written] == [rows[0]["id"], rows[2]["id"], rows[3]["id"]]
+
+
+def test_transcript_batch_job_restores_timestamps(fake_session):
+    row = _transcript()
+    session = fake_session()
+
+    asyncio.run(chat_background_utils.transcript_batch_job(
+        session, {"transcripts": [{**row, "created_at": row["created_at"].isoformat()}]}))
+
+    assert session.written[0]["created_at"] == row["created_at"]
+
+
+def _buffer(monkeypatch, write, max_rows=100, max_pending=100):
+    class _SessionLocal:
+        async def __aenter__(self):
+            return object()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(chat_background_utils.settings, "job_queue_enabled", False)
+    monkeypatch.setattr(chat_background_utils, "SessionLocal", _SessionLocal)
+    monkeypatch.setattr(chat_background_utils, "write_transcript_batch", write)
+    return TranscriptBuffer(max_rows=max_rows, flush_interval=60, max_pending=max_pending)
+
+
+def test_flush_writes_and_empties_the_buffer(monkeypatch):
+    written = []
+
+    async def write(session, transcripts):
+        written.extend(transcripts)
+        return 0
+
+    buffer = _buffer(monkeypatch, write)
+
+    async def run():
+        buffer.add_transcript(_transcript())
+        buffer.add_transcript(_transcript())
+        await buffer.flush()
+
+    asyncio.run(run())
+    assert len(written) == 2
+    assert len(buffer) == 0
+
+
+def test_failed_flush_requeues_before_newer_rows(monkeypatch):
+    async def write(session, transcripts):
+        raise OperationalError("INSERT", {}, Exception("connection lost"))
+
+    buffer = _buffer(monkeypatch, write)
+    first, second = _transcript(message="first"), _transcript(message="second")
+
+    async def run():
+        buffer.add_transcript(first)
+        await buffer.flush()
+        buffer.add_transcript(second)
+
+    asyncio.run(run())
+    assert [row["message"] for row in buffer._transcripts] == ["first", "second"]
+
+
+def test_failed_flush_drops_the_batch_past_max_pending(monkeypatch):
+    async def write(session, transcripts):
+        raise OperationalError("INSERT", {}, Exception("connection lost"))
+
+    buffer = _buffer(monkeypatch, write, max_pending=1)
+
+    async def run():
+        buffer.add_transcript(_transcript())
+        buffer.add_transcript(_transcript())
+        await buffer.flush()
+
+    asyncio.run(run())
+    assert len(buffer) == 0
+
+
+def test_max_rows_triggers_a_flush(monkeypatch):
+    written = []
+
+    async def write(session, transcripts):
+        written.extend(transcripts)
+        return 0
+
+    buffer = _buffer(monkeypatch, write, max_rows=2)
+
+    async def run():
+        buffer.add_transcript(_transcript())
+        buffer.add_transcript(_transcript())
+        # The flush runs as a task of its own
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert len(written) == 2
+
+
+def test_has_pending_and_discard_session(monkeypatch):
+    buffer = _buffer(monkeypatch, None)
+
+    async def run():
+        buffer.add_transcript(_transcript("deleted"))
+        buffer.add_transcript(_transcript("kept"))
+        buffer.add_transcript(_transcript("deleted"))
+
+    asyncio.run(run())
+    assert buffer.has_pending("deleted")
+    assert buffer.discard_session("deleted") == 2
+    assert not buffer.has_pending("deleted")
+    assert buffer.has_pending("kept")